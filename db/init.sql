@@ -153,6 +153,7 @@ CREATE TABLE IF NOT EXISTS payment (
 
 -- Helpful indexes
 CREATE INDEX IF NOT EXISTS idx_sale_user_id ON sale(user_id);
+CREATE INDEX IF NOT EXISTS idx_sale_user_time ON sale(user_id, sale_time); -- dashboard date range + ordering
 CREATE INDEX IF NOT EXISTS idx_sale_item_sale_id ON sale_item(sale_id);
 CREATE INDEX IF NOT EXISTS idx_sale_item_product_id ON sale_item(product_id);
 CREATE INDEX IF NOT EXISTS idx_payment_sale_id ON payment(sale_id);
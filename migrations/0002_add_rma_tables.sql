@@ -142,6 +142,7 @@ CREATE TABLE IF NOT EXISTS rma_activity_log (
     actor TEXT,                                 -- Who performed the action (user/system)
     notes TEXT,
     metadata TEXT,                              -- JSON for additional data
+    replacement_sale_id INTEGER,                -- Sale created by a REPLACEMENT disposition (indexed by init_db)
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
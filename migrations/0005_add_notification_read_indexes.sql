@@ -0,0 +1,7 @@
+-- Migration: Indexes for notification badge and list queries
+-- Created: 2026-10-16
+-- Description: Partial index over unread rows only for get_unread_count, and
+-- a per-user recency index so get_user_notifications can skip the sort
+
+CREATE INDEX IF NOT EXISTS ix_notif_unread ON notifications(user_id) WHERE is_read = 0;
+CREATE INDEX IF NOT EXISTS ix_notif_user_created ON notifications(user_id, created_at DESC);
@@ -1,5 +1,8 @@
-from .registry import get_adapter, register_adapter
-from .json_adapter import parse_json  # registers itself
-from .csv_adapter import parse_csv    # registers itself
+from .registry import get_adapter, register_adapter, get_stream_adapter, register_stream_adapter
+from .json_adapter import parse_json, iter_json_batches  # registers itself
+from .csv_adapter import parse_csv, iter_csv_batches    # registers itself
 
-__all__ = ["get_adapter", "register_adapter", "parse_json", "parse_csv"]
+__all__ = [
+    "get_adapter", "register_adapter", "get_stream_adapter", "register_stream_adapter",
+    "parse_json", "iter_json_batches", "parse_csv", "iter_csv_batches",
+]
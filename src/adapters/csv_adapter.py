@@ -1,30 +1,50 @@
 import csv
-from io import StringIO
-from .registry import register_adapter
+from io import StringIO, TextIOWrapper
+from .registry import register_adapter, register_stream_adapter
+
+CSV_BATCH_SIZE = 1000
+
+def _normalize_row(row):
+    price = row.get('price_cents') or row.get('price') or '0'
+    try:
+        price_cents = int(price)
+    except Exception:
+        try:
+            price_cents = int(float(price) * 100)
+        except Exception:
+            price_cents = 0
+    sku = str(row.get('sku') or row.get('id') or '').strip()
+    name = str(row.get('name', '')).strip()
+    return {
+        'sku': sku,
+        'name': name,
+        'price_cents': price_cents,
+        'stock': int(row.get('stock', 0)),
+        'partner_id': row.get('partner_id', 'unknown'),
+        'extra': row,
+    }
 
 def parse_csv(payload: bytes, content_type: str):
     s = payload.decode('utf-8')
     reader = csv.DictReader(StringIO(s))
-    out = []
-    for row in reader:
-        price = row.get('price_cents') or row.get('price') or '0'
-        try:
-            price_cents = int(price)
-        except Exception:
-            try:
-                price_cents = int(float(price) * 100)
-            except Exception:
-                price_cents = 0
-        sku = str(row.get('sku') or row.get('id') or '').strip()
-        name = str(row.get('name', '')).strip()
-        out.append({
-            'sku': sku,
-            'name': name,
-            'price_cents': price_cents,
-            'stock': int(row.get('stock', 0)),
-            'partner_id': row.get('partner_id', 'unknown'),
-            'extra': row,
-        })
-    return out
+    return [_normalize_row(row) for row in reader]
+
+def iter_csv_batches(stream, batch_size: int = CSV_BATCH_SIZE):
+    """Parse a binary CSV stream incrementally, yielding lists of at most
+    batch_size products so the whole upload is never held in memory."""
+    text = TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        batch = []
+        for row in csv.DictReader(text):
+            batch.append(_normalize_row(row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        # Don't let the wrapper close the underlying request stream
+        text.detach()
 
 register_adapter('text/csv', parse_csv)
+register_stream_adapter('text/csv', iter_csv_batches)
@@ -1,33 +1,55 @@
 import json
-from .registry import register_adapter
+from .registry import register_adapter, register_stream_adapter
 
-def parse_json(payload: bytes, content_type: str):
-    data = json.loads(payload.decode('utf-8'))
-    out = []
-    for item in data:
-        sku = str(item.get('sku') or item.get('id') or '').strip()
-        name = str(item.get('name', '')).strip()
-        price = item.get('price_cents') if item.get('price_cents') is not None else item.get('price', 0)
-        if isinstance(price, int):
-            price_cents = price
-        elif isinstance(price, float):
-            price_cents = int(round(price * 100))
-        else:
+try:
+    import ijson
+except ImportError:  # optional; JSON uploads are then parsed whole
+    ijson = None
+
+JSON_BATCH_SIZE = 500
+
+def _normalize_item(item):
+    sku = str(item.get('sku') or item.get('id') or '').strip()
+    name = str(item.get('name', '')).strip()
+    price = item.get('price_cents') if item.get('price_cents') is not None else item.get('price', 0)
+    if isinstance(price, int):
+        price_cents = price
+    elif isinstance(price, float):
+        price_cents = int(round(price * 100))
+    else:
+        try:
+            price_cents = int(price)
+        except Exception:
             try:
-                price_cents = int(price)
+                price_cents = int(float(price) * 100)
             except Exception:
-                try:
-                    price_cents = int(float(price) * 100)
-                except Exception:
-                    price_cents = 0
-        out.append({
-            'sku': sku,
-            'name': name,
-            'price_cents': price_cents,
-            'stock': int(item.get('stock', 0)),
-            'partner_id': item.get('partner_id', 'unknown'),
-            'extra': item,
-        })
-    return out
+                price_cents = 0
+    return {
+        'sku': sku,
+        'name': name,
+        'price_cents': price_cents,
+        'stock': int(item.get('stock', 0)),
+        'partner_id': item.get('partner_id', 'unknown'),
+        'extra': item,
+    }
+
+def parse_json(payload: bytes, content_type: str):
+    data = json.loads(payload.decode('utf-8'))
+    return [_normalize_item(item) for item in data]
+
+def iter_json_batches(stream, batch_size: int = JSON_BATCH_SIZE):
+    """Parse a binary JSON array stream incrementally with ijson, yielding
+    lists of at most batch_size products."""
+    batch = []
+    # use_float keeps prices as float (not Decimal) so they round like parse_json
+    for item in ijson.items(stream, 'item', use_float=True):
+        batch.append(_normalize_item(item))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 register_adapter('application/json', parse_json)
+if ijson is not None:
+    register_stream_adapter('application/json', iter_json_batches)
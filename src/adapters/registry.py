@@ -1,11 +1,20 @@
-from typing import Callable, Dict
+from typing import BinaryIO, Callable, Dict, Iterator
 
 AdapterFn = Callable[[bytes, str], list]
+# Stream adapters read a file-like body and yield lists of products
+StreamAdapterFn = Callable[[BinaryIO], Iterator[list]]
 
 registry: Dict[str, AdapterFn] = {}
+stream_registry: Dict[str, StreamAdapterFn] = {}
 
 def register_adapter(name: str, fn: AdapterFn) -> None:
     registry[name] = fn
 
 def get_adapter(name: str):
     return registry.get(name)
+
+def register_stream_adapter(name: str, fn: StreamAdapterFn) -> None:
+    stream_registry[name] = fn
+
+def get_stream_adapter(name: str):
+    return stream_registry.get(name)
@@ -1,44 +1,238 @@
 from __future__ import annotations
-from .product_repo import AProductRepo
-
-from werkzeug.security import generate_password_hash, check_password_hash
+from .product_repo import AProductRepo, invalidate_product_cache, register_product_cache
 
 import os
+from collections import namedtuple
+from functools import wraps
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import Dict
 
-from flask import Flask, redirect, render_template, request, session, url_for, flash, g, jsonify 
+from flask import Flask, redirect, render_template, request, session, url_for, flash, g, jsonify, send_from_directory, abort
+from werkzeug.security import safe_join
+import hashlib
+import json
+import logging
+import mimetypes
+import random
 import sqlite3
 import time
-import uuid
 
-from .dao import SalesRepo, ProductRepo, get_connection
+from .dao import SalesRepo, get_pool
 from .payment import process as payment_process
 from .main import init_db
-from .adapters.registry import get_adapter
+from .adapters.registry import get_adapter, get_stream_adapter
 from .partners.partner_ingest_service import validate_products, upsert_products
+from .partners.ingest_queue import enqueue_feed_db
 from .session_interface import DatabaseSessionInterface
+from .passwords import hash_password, verify_password, needs_rehash, unknown_user_delay
+from .flash_sales.cache import SimpleCache
+from .notifications import NotificationService
+
+# Checkout pays through the circuit breaker + retry wrapper when available
+try:
+    from .flash_sales.payment_resilience import process_payment_resilient as checkout_payment
+except ImportError:
+    checkout_payment = payment_process
 
 # Import observability components
 try:
     # Use absolute imports to ensure a single module instance across the app
-    from src.observability.structured_logger import app_logger, log_request
-    from src.observability.metrics_collector import metrics_collector, track_request_duration
+    from src.observability.structured_logger import app_logger, get_request_id
+    from src.observability.metrics_collector import metrics_collector, metrics_buffer
     OBSERVABILITY_ENABLED = True
 except ImportError:
     OBSERVABILITY_ENABLED = False
     print("Warning: Observability modules not found. Running without observability.")
 
 
+# Hot-path SQL, kept as single module-level strings. sqlite3 caches prepared
+# statements per connection keyed by SQL text, so with pooled connections
+# each of these is parsed once per connection rather than once per request.
+_SQL_USER_BY_USERNAME = "SELECT id, username, password, name FROM user WHERE username = ?"
+_SQL_USER_EXISTS = "SELECT id FROM user WHERE username = ?"
+_SQL_USER_INSERT = "INSERT INTO user (name, username, password) VALUES (?, ?, ?)"
+_SQL_USER_NAME_BY_ID = "SELECT username, name FROM user WHERE id = ?"
+_SQL_USER_SET_PASSWORD = "UPDATE user SET password = ? WHERE id = ?"
+_SQL_PARTNER_BY_API_KEY = "SELECT partner_id FROM partner_api_keys WHERE api_key = ?"
+_SQL_RECEIPT = (
+    "SELECT s.id, s.user_id, s.sale_time, s.total_cents, s.status, "
+    "si.product_id, p.name AS product_name, si.quantity, si.price_cents, "
+    "pay.method AS pay_method, pay.amount_cents AS pay_amount_cents, "
+    "pay.status AS pay_status, pay.ref AS pay_ref "
+    "FROM sale s "
+    "LEFT JOIN sale_item si ON si.sale_id = s.id "
+    "LEFT JOIN product p ON p.id = si.product_id "
+    "LEFT JOIN payment pay ON pay.sale_id = s.id "
+    "WHERE s.id = ? ORDER BY si.id"
+)
+# Cart value in one statement; the cart is bound as a single JSON array of
+# [product_id, qty] pairs so any cart size stays within SQLite's parameter limit
+_SQL_CART_TOTAL = (
+    "SELECT COALESCE(SUM(p.price_cents * json_extract(c.value, '$[1]')), 0) "
+    "FROM json_each(?) c JOIN product p ON p.id = json_extract(c.value, '$[0]')"
+)
+# Most relevant RMA for a receipt: in-progress first, then rejected, then
+# completed (latest within each bucket); cancelled requests never count
+_SQL_RECEIPT_RMA = (
+    "SELECT disposition, status, "
+    "CASE WHEN status NOT IN ('COMPLETED','REJECTED','CANCELLED') THEN 1 "
+    "WHEN status = 'REJECTED' THEN 2 "
+    "WHEN status = 'COMPLETED' THEN 3 END AS bucket "
+    "FROM rma_requests WHERE sale_id = ? AND status <> 'CANCELLED' "
+    "ORDER BY bucket, created_at DESC LIMIT 1"
+)
+_SQL_FLASH_SALE_PRODUCTS = (
+    "SELECT id, name, price_cents, flash_sale_active, flash_sale_price_cents "
+    "FROM product WHERE active = 1 ORDER BY name"
+)
+_SQL_FLASH_SALE_SET = "UPDATE product SET flash_sale_active = 1, flash_sale_price_cents = ? WHERE id = ?"
+_SQL_FLASH_SALE_CLEAR = "UPDATE product SET flash_sale_active = 0, flash_sale_price_cents = NULL WHERE id = ?"
+
+_DASHBOARD_ORDERS_BASE = """
+    SELECT s.id, s.sale_time as created_at, s.status, 
+           s.total_cents / 100.0 as total,
+           GROUP_CONCAT(p.name || ' (' || si.quantity || 'x)', ', ') as items_summary,
+           -- RMA state per order; '' marks a matching RMA with no disposition yet
+           (SELECT COALESCE(r.disposition, '') FROM rma_requests r
+            WHERE r.sale_id = s.id AND r.status NOT IN ('COMPLETED','REJECTED','CANCELLED')
+            ORDER BY r.created_at DESC LIMIT 1) as active_disposition,
+           (SELECT COALESCE(r.disposition, '') FROM rma_requests r
+            WHERE r.sale_id = s.id AND r.status = 'COMPLETED'
+            ORDER BY r.created_at DESC LIMIT 1) as completed_disposition,
+           EXISTS(SELECT 1 FROM rma_requests r
+                  WHERE r.sale_id = s.id AND r.status = 'REJECTED') as has_rejected_rma,
+           EXISTS(SELECT 1 FROM rma_requests r WHERE r.sale_id = s.id) as has_rma
+    FROM sale s
+    LEFT JOIN sale_item si ON s.id = si.sale_id
+    LEFT JOIN product p ON si.product_id = p.id
+    WHERE s.user_id = ?
+"""
+
+# One row of the dashboard orders query; fields follow its SELECT list
+DashboardOrder = namedtuple(
+    "DashboardOrder",
+    "id created_at status total items_summary active_disposition "
+    "completed_disposition has_rejected_rma has_rma",
+)
+
+
+def _dashboard_order_row(cursor, row):
+    return DashboardOrder._make(row)
+
+
+# Dashboard order status shown for an in-progress / completed RMA, by disposition
+_RMA_ACTIVE_DISPLAY_STATUS = {
+    "REPAIR": "REPAIRING",
+    "REPLACEMENT": "REPLACING",
+    "REFUND": "REFUNDING",
+    "STORE_CREDIT": "STORE_CREDIT",
+    "REJECT": "RETURN_REJECTED",
+}
+_RMA_COMPLETED_DISPLAY_STATUS = {
+    "REPAIR": "REPAIRED",
+    "REPLACEMENT": "REPLACED",
+    "STORE_CREDIT": "CREDITED",
+    "REFUND": "REFUNDED",
+    "REJECT": "RETURN_REJECTED",
+}
+
+# Receipt status by (disposition, bucket of _SQL_RECEIPT_RMA); any rejected
+# RMA reads RETURN_REJECTED and is handled separately
+_RECEIPT_RMA_DISPLAY_STATUS = {
+    ("REPAIR", 1): "REPAIRING",
+    ("REPLACEMENT", 1): "REPLACING",
+    ("REFUND", 1): "REFUNDING",
+    ("STORE_CREDIT", 1): "STORE_CREDIT",
+    ("REJECT", 1): "RETURN_REJECTED",
+    ("REPAIR", 3): "REPAIRED",
+    ("REPLACEMENT", 3): "REPLACED",
+    ("STORE_CREDIT", 3): "CREDITED",
+}
+
+# Dashboard order queries keyed by which filters are present; a small fixed
+# set of SQL strings keeps the per-connection statement cache hitting
+_DASHBOARD_SQL: Dict[tuple, str] = {}
+
+
+def _dashboard_orders_sql(status_mode, has_start: bool, has_end: bool, has_search: bool) -> str:
+    """Return the dashboard orders query for a filter combination.
+
+    status_mode is None, 'status' (exact sale status) or 'returned' (orders
+    with a completed RMA). Placeholders are bound in the order user_id,
+    status, start date, end date, search pattern (twice).
+    """
+    key = (status_mode, has_start, has_end, has_search)
+    sql = _DASHBOARD_SQL.get(key)
+    if sql is not None:
+        return sql
+    sql = _DASHBOARD_ORDERS_BASE
+    # Apply status filter (including RMA-related statuses)
+    if status_mode == 'status':
+        sql += " AND s.status = ?"
+    elif status_mode == 'returned':
+        # For RETURNED status, find orders with completed RMAs
+        sql += """ AND s.id IN (
+            SELECT sale_id FROM rma_requests 
+            WHERE status = 'COMPLETED' AND disposition IN ('REFUND', 'REPLACEMENT', 'REPAIR', 'STORE_CREDIT')
+        )"""
+    # Apply date range filter. Compare the stored 'YYYY-MM-DD HH:MM:SS' text
+    # directly (same result as DATE(s.sale_time) between the two days) so the
+    # (user_id, sale_time) index can serve the range.
+    if has_start:
+        sql += " AND s.sale_time >= DATE(?)"
+    if has_end:
+        sql += " AND s.sale_time < DATE(?, '+1 day')"
+    # Apply search filter (by order ID or product name)
+    if has_search:
+        sql += """ AND (
+            CAST(s.id AS TEXT) LIKE ? OR
+            s.id IN (
+                SELECT DISTINCT si2.sale_id 
+                FROM sale_item si2
+                JOIN product p2 ON si2.product_id = p2.id
+                WHERE p2.name LIKE ?
+            )
+        )"""
+    sql += " GROUP BY s.id ORDER BY s.sale_time DESC"
+    _DASHBOARD_SQL[key] = sql
+    return sql
+
+_ROOT = Path(__file__).resolve().parents[1]
+_DEFAULT_DB = str(_ROOT / "app.sqlite")
+
+# One row of the cart page; Jinja resolves attribute access on a namedtuple
+# directly instead of falling back from getattr to dict lookup
+CartLine = namedtuple("CartLine", "id name qty unit line is_flash_sale original_price")
+
+
 def create_app() -> Flask:
     app = Flask(__name__, template_folder="templates")
     app.secret_key = os.environ.get("APP_SECRET_KEY", "dev-insecure-secret")
     # Low stock threshold (configurable via environment variable)
     app.config['LOW_STOCK_THRESHOLD'] = int(os.environ.get('LOW_STOCK_THRESHOLD', '5'))
+    # Seconds to cache catalog reads in-process (0 disables the cache)
+    app.config['PRODUCT_CACHE_TTL'] = int(os.environ.get('PRODUCT_CACHE_TTL', '5'))
+    # Seconds a validated partner API key stays cached (0 disables)
+    app.config['PARTNER_KEY_CACHE_TTL'] = int(os.environ.get('PARTNER_KEY_CACHE_TTL', '300'))
+    # Profile 1 in N observed requests with pyinstrument (0 disables)
+    app.config['PROFILE_SAMPLE'] = int(os.environ.get('APP_PROFILE_SAMPLE', '0'))
+    # Write structured logs from a background thread (0 keeps them synchronous)
+    app.config['LOG_ASYNC'] = os.environ.get('LOG_ASYNC', '1') != '0'
+    # Fraction of successful requests that get start/complete log lines;
+    # 4xx/5xx responses are always logged
+    app.config['OBS_SAMPLE_RATE'] = float(os.environ.get('OBS_SAMPLE_RATE', '0.1'))
+    # Parse all Jinja templates in create_app rather than on first render
+    app.config['PRECOMPILE_TEMPLATES'] = os.environ.get('PRECOMPILE_TEMPLATES', '1') != '0'
+    # Internal nginx location aliased to the RMA upload dir (e.g. /internal_rma/);
+    # when set, uploads are handed to nginx with X-Accel-Redirect
+    app.config['RMA_UPLOAD_ACCEL_PREFIX'] = os.environ.get('RMA_UPLOAD_ACCEL_PREFIX', '')
+
+    # Resolved once per app; every component below shares this database
+    db_path = os.environ.get("APP_DB_PATH", _DEFAULT_DB)
 
     # Setup database-backed session interface for independent multi-tab sessions
-    root = Path(__file__).resolve().parents[1]
-    db_path = os.environ.get("APP_DB_PATH", str(root / "app.sqlite"))
     app.session_interface = DatabaseSessionInterface(db_path)
 
     from .flash_sales.routes import flash_bp
@@ -60,6 +254,10 @@ def create_app() -> Flask:
 
     # Register monitoring blueprint for observability
     if OBSERVABILITY_ENABLED:
+        # Drain buffered request metrics into the collector in the background
+        metrics_buffer.start()
+        if app.config['LOG_ASYNC']:
+            app_logger.start_async()
         try:
             from .monitoring_routes import monitoring_bp
             app.register_blueprint(monitoring_bp)
@@ -67,12 +265,36 @@ def create_app() -> Flask:
         except Exception as e:
             app.logger.exception("Failed to register monitoring blueprint")
 
-    root = Path(__file__).resolve().parents[1]
-    db_path = os.environ.get("APP_DB_PATH", str(root / "app.sqlite"))
     init_db(db_path)
+    pool = get_pool(db_path)
+
+    product_cache = None
+    if app.config['PRODUCT_CACHE_TTL'] > 0:
+        product_cache = SimpleCache(default_ttl=app.config['PRODUCT_CACHE_TTL'])
+        register_product_cache(product_cache)
 
-    def get_conn():
-        return get_connection(db_path)
+    # api_key -> partner_id for keys that validated; unknown keys are never
+    # cached, so newly issued keys work at once. Flush after revoking a key.
+    partner_key_cache = None
+    if app.config['PARTNER_KEY_CACHE_TTL'] > 0:
+        partner_key_cache = SimpleCache(default_ttl=app.config['PARTNER_KEY_CACHE_TTL'])
+
+    def lookup_partner_id(api_key: str):
+        if partner_key_cache is not None:
+            partner_id = partner_key_cache.get(api_key)
+            if partner_id is not None:
+                return partner_id
+        with pool.connection() as conn:
+            row = conn.execute(_SQL_PARTNER_BY_API_KEY, (api_key,)).fetchone()
+        if row is None:
+            return None
+        if partner_key_cache is not None:
+            partner_key_cache.set(api_key, row['partner_id'])
+        return row['partner_id']
+
+    def get_product_repo(conn: sqlite3.Connection) -> AProductRepo:
+        """Catalog and low-stock reads; served from product_cache when enabled."""
+        return AProductRepo(conn, cache=product_cache)
 
     def get_repo(conn: sqlite3.Connection) -> SalesRepo:
         return SalesRepo(conn, AProductRepo(conn))
@@ -80,8 +302,6 @@ def create_app() -> Flask:
     # Start background ingest worker if partners blueprint is available
     try:
         from .partners.ingest_queue import start_worker
-        root = Path(__file__).resolve().parents[1]
-        db_path = os.environ.get("APP_DB_PATH", str(root / "app.sqlite"))
         start_worker(db_path)
     except Exception:
         pass
@@ -90,55 +310,85 @@ def create_app() -> Flask:
     # OBSERVABILITY MIDDLEWARE
     # ============================================
     
+    # Probe and asset endpoints are not worth a log line or histogram sample.
+    # /health is normally answered by the WSGI short-circuit below; the
+    # monitoring dashboard polls its own health endpoint every few seconds.
+    unobserved_endpoints = {"health_check", "monitoring.health_check", "static"}
+
+    request_profiler = None
+    if OBSERVABILITY_ENABLED and app.config['PROFILE_SAMPLE'] > 0:
+        # Only pay for importing the profiler (and pyinstrument) when sampling is on
+        from src.observability.profiling import RequestProfiler
+        request_profiler = RequestProfiler(
+            app.config['PROFILE_SAMPLE'],
+            os.environ.get('APP_PROFILE_DIR', 'logs/profiles')
+        )
+        if not request_profiler.enabled:
+            app.logger.warning("APP_PROFILE_SAMPLE is set but pyinstrument is not installed; profiling disabled")
+            request_profiler = None
+
     @app.before_request
     def before_request_observability():
         """Initialize request tracking for observability"""
-        # Generate unique request ID
-        g.request_id = request.headers.get('X-Request-Id') or str(uuid.uuid4())
-        g.start_time = time.time()
+        if not OBSERVABILITY_ENABLED or request.endpoint in unobserved_endpoints:
+            return
+        # The request ID is created lazily by get_request_id() on first log line
+        g.start_time = time.perf_counter_ns()
+        g.obs_sample = random.random() < app.config['OBS_SAMPLE_RATE']
         
-        if OBSERVABILITY_ENABLED:
+        if g.obs_sample and app_logger.isEnabledFor(logging.INFO):
+            method, path = request.method, request.path
             app_logger.info(
-                f"Request started: {request.method} {request.path}",
-                method=request.method,
-                path=request.path,
+                "Request started: %s %s", method, path,
+                method=method,
+                path=path,
                 remote_addr=request.remote_addr
             )
+        if request_profiler is not None:
+            g.profiler = request_profiler.start(get_request_id())
     
     @app.after_request
     def after_request_observability(response):
         """Record metrics after each request"""
-        if OBSERVABILITY_ENABLED and hasattr(g, 'start_time'):
+        start_time = g.get('start_time')
+        if start_time is not None:
             try:
-                duration = time.time() - g.start_time
+                duration = (time.perf_counter_ns() - start_time) / 1e9
+                method, status_code = request.method, response.status_code
+                response.headers['X-API-Time'] = f"{duration * 1000:.2f}"
+                
+                profiler = g.pop('profiler', None)
+                if profiler is not None:
+                    request_profiler.finish(profiler)
                 
                 # Record response time
-                metrics_collector.observe(
+                metrics_buffer.observe(
                     'http_request_duration_seconds',
                     duration,
                     labels={
                         'endpoint': request.endpoint or 'unknown',
-                        'method': request.method,
-                        'status': response.status_code
+                        'method': method,
+                        'status': status_code
                     }
                 )
                 
-                # Log completion
-                app_logger.info(
-                    f"Request completed: {request.method} {request.path}",
-                    status_code=response.status_code,
-                    duration_ms=round(duration * 1000, 2)
-                )
+                # Log completion for sampled requests and every error
+                if (g.obs_sample or status_code >= 400) and app_logger.isEnabledFor(logging.INFO):
+                    app_logger.info(
+                        "Request completed: %s %s", method, request.path,
+                        status_code=status_code,
+                        duration_ms=round(duration * 1000, 2)
+                    )
                 
                 # Track HTTP errors
-                if response.status_code >= 400:
+                if status_code >= 400:
                     # Increment overall error counter for dashboard totals/rates
-                    metrics_collector.increment_counter('errors_total')
-                    metrics_collector.record_event('errors_total')
-                    if 400 <= response.status_code < 500:
-                        metrics_collector.increment_counter('http_errors', labels={'type': '4xx'})
-                    elif 500 <= response.status_code < 600:
-                        metrics_collector.increment_counter('http_errors', labels={'type': '5xx'})
+                    metrics_buffer.increment_counter('errors_total')
+                    metrics_buffer.record_event('errors_total')
+                    if 400 <= status_code < 500:
+                        metrics_buffer.increment_counter('http_errors', labels={'type': '4xx'})
+                    elif 500 <= status_code < 600:
+                        metrics_buffer.increment_counter('http_errors', labels={'type': '5xx'})
                         
             except Exception as e:
                 app.logger.error(f"Error in observability middleware: {e}")
@@ -150,9 +400,9 @@ def create_app() -> Flask:
         """Handle 404 errors with observability"""
         if OBSERVABILITY_ENABLED:
             # Count both category and total for dashboard visibility
-            metrics_collector.increment_counter('errors_total')
-            metrics_collector.record_event('errors_total')
-            metrics_collector.increment_counter('http_errors', labels={'type': '4xx'})
+            metrics_buffer.increment_counter('errors_total')
+            metrics_buffer.record_event('errors_total')
+            metrics_buffer.increment_counter('http_errors', labels={'type': '4xx'})
             app_logger.warning(f"404 Not Found: {request.path}")
         return render_template('404.html'), 404
     
@@ -161,9 +411,9 @@ def create_app() -> Flask:
         """Handle 500 errors with observability"""
         if OBSERVABILITY_ENABLED:
             # Count both category and total for dashboard visibility
-            metrics_collector.increment_counter('errors_total')
-            metrics_collector.record_event('errors_total')
-            metrics_collector.increment_counter('http_errors', labels={'type': '5xx'})
+            metrics_buffer.increment_counter('errors_total')
+            metrics_buffer.record_event('errors_total')
+            metrics_buffer.increment_counter('http_errors', labels={'type': '5xx'})
             app_logger.error(f"500 Internal Server Error", error=str(error))
         return render_template('500.html'), 500
     
@@ -171,11 +421,15 @@ def create_app() -> Flask:
     def rate_limit_error(error):
         """Handle rate limit errors"""
         if OBSERVABILITY_ENABLED:
-            metrics_collector.increment_counter('errors_total', labels={'type': 'rate_limit'})
-            metrics_collector.record_event('errors_total')
+            metrics_buffer.increment_counter('errors_total', labels={'type': 'rate_limit'})
+            metrics_buffer.record_event('errors_total')
             app_logger.warning("Rate limit exceeded", ip=request.remote_addr)
         return {'error': 'Rate limit exceeded. Please try again later.'}, 429
 
+    # Redirect targets for hot paths, resolved once after all routes are
+    # registered (see the end of create_app) instead of per-request url_for
+    urls: Dict[str, str] = {}
+
     # ============================================
     # ROUTES
     # ============================================
@@ -184,8 +438,8 @@ def create_app() -> Flask:
     def index():
         """Home page - redirect to login if not logged in, otherwise to products"""
         if "user_id" in session:
-            return redirect(url_for("products"))
-        return redirect(url_for("login"))
+            return redirect(urls["products"])
+        return redirect(urls["login"])
 
     @app.route("/health")
     def health_check():
@@ -208,34 +462,6 @@ def create_app() -> Flask:
         # Fallback: username (database admin or regular user)
         username = session.get("admin_username") or session.get("username", "Admin")
         
-        # If we have an admin_user_id (database admin preserving user session), fetch that user
-        admin_user_id = session.get("admin_user_id")
-        if admin_user_id:
-            conn = get_conn()
-            try:
-                admin_user = conn.execute(
-                    "SELECT username, name FROM user WHERE id = ?",
-                    (admin_user_id,)
-                ).fetchone()
-                if admin_user:
-                    username = admin_user["username"]
-            finally:
-                conn.close()
-        # Otherwise if username is from a database user (regular login), fetch current info
-        elif not session.get("admin_username"):
-            user_id = session.get("user_id")
-            if user_id:
-                conn = get_conn()
-                try:
-                    user = conn.execute(
-                        "SELECT username, name FROM user WHERE id = ?",
-                        (user_id,)
-                    ).fetchone()
-                    if user:
-                        username = user["username"]
-                finally:
-                    conn.close()
-        
         # Low stock alerts (allow optional override via query param for quick inspection)
         override = request.args.get('low_stock_threshold')
         threshold = app.config.get('LOW_STOCK_THRESHOLD', 5)
@@ -246,15 +472,27 @@ def create_app() -> Flask:
                     threshold = o_val
             except ValueError:
                 pass
-        conn = get_conn()
-        low_stock_products = []
-        try:
-            repo = AProductRepo(conn)
-            low_stock_products = repo.get_low_stock_products(threshold)
-        except Exception:
-            low_stock_products = []
-        finally:
-            conn.close()
+        
+        # One pooled connection serves both the user lookup and the low-stock list
+        with pool.connection() as conn:
+            # If we have an admin_user_id (database admin preserving user session), fetch that user
+            admin_user_id = session.get("admin_user_id")
+            if admin_user_id:
+                admin_user = conn.execute(_SQL_USER_NAME_BY_ID, (admin_user_id,)).fetchone()
+                if admin_user:
+                    username = admin_user["username"]
+            # Otherwise if username is from a database user (regular login), fetch current info
+            elif not session.get("admin_username"):
+                user_id = session.get("user_id")
+                if user_id:
+                    user = conn.execute(_SQL_USER_NAME_BY_ID, (user_id,)).fetchone()
+                    if user:
+                        username = user["username"]
+            
+            try:
+                low_stock_products = get_product_repo(conn).get_low_stock_products(threshold)
+            except Exception:
+                low_stock_products = []
 
         return render_template(
             "admin_home.html",
@@ -268,14 +506,27 @@ def create_app() -> Flask:
         """Return JSON list of low-stock products (admin only)."""
         if not (session.get('is_admin') or session.get('admin_user_id') or session.get('admin_username')):
             return jsonify({'error': 'Unauthorized'}), 403
-        conn = get_conn()
-        try:
-            repo = AProductRepo(conn)
+        with pool.connection() as conn:
+            repo = get_product_repo(conn)
             threshold = app.config.get('LOW_STOCK_THRESHOLD', 5)
             products = repo.get_low_stock_products(threshold)
             return jsonify({'threshold': threshold, 'products': products})
-        finally:
-            conn.close()
+
+    @app.route('/admin/pool-health')
+    def admin_pool_health():
+        """Return JSON connection pool usage (admin only)."""
+        if not (session.get('is_admin') or session.get('admin_user_id') or session.get('admin_username')):
+            return jsonify({'error': 'Unauthorized'}), 403
+        return jsonify(pool.stats())
+
+    @app.post('/admin/cache/partner-keys/flush')
+    def admin_flush_partner_keys():
+        """Drop cached partner API keys, e.g. after revoking one (admin only)."""
+        if not (session.get('is_admin') or session.get('admin_user_id') or session.get('admin_username')):
+            return jsonify({'error': 'Unauthorized'}), 403
+        if partner_key_cache is not None:
+            partner_key_cache.clear()
+        return jsonify({'flushed': True})
 
     @app.route("/products")
     def products():
@@ -283,10 +534,9 @@ def create_app() -> Flask:
             flash("Please login to access products", "error")
             return redirect(url_for("login"))
         q = request.args.get("q", "").strip()
-        conn = get_conn()
-        try:
+        with pool.connection() as conn:
             try:
-                repo = AProductRepo(conn)
+                repo = get_product_repo(conn)
                 if q:
                     rows = repo.search_products(q)
                 else:
@@ -298,8 +548,22 @@ def create_app() -> Flask:
                     "error",
                 )
             return render_template("products.html", products=rows, q=q)
-        finally:
-            conn.close()
+
+    def wants_json() -> bool:
+        """True for XHR/fetch callers that asked for JSON instead of a redirect."""
+        return (
+            request.headers.get("X-Requested-With") == "XMLHttpRequest"
+            or request.accept_mimetypes.best == "application/json"
+        )
+
+    def cart_reply(message: str, category: str, target: str, status: int = 200):
+        """Flash and redirect for pages; JSON with the current cart for scripts."""
+        if wants_json():
+            if status >= 400:
+                return jsonify({"ok": False, "error": message}), status
+            return jsonify({"ok": True, "message": message, "cart": session.get("cart", {})})
+        flash(message, category)
+        return redirect(target)
 
     @app.post("/cart/add")
     def cart_add():
@@ -307,79 +571,71 @@ def create_app() -> Flask:
         qty = int(request.form.get("qty", 1))
         
         if qty <= 0:
-            flash("Quantity must be > 0", "error")
-            return redirect(url_for("products"))
+            return cart_reply("Quantity must be > 0", "error", urls["products"], 400)
         
-        conn = get_conn()
-        try:
-            repo = AProductRepo(conn)
-            product = repo.get_product(pid)
+        with pool.connection() as conn:
+            try:
+                repo = get_product_repo(conn)
+                product = repo.get_product(pid)
             
-            if not product:
-                flash(f"Product ID {pid} not found", "error")
-                return redirect(url_for("products"))
+                if not product:
+                    return cart_reply(f"Product ID {pid} not found", "error", urls["products"], 404)
             
-            if not repo.check_stock(pid, qty):
-                flash(f"Only {product['stock']} in stock for {product['name']}", "error")
-                return redirect(url_for("products"))
+                if not repo.check_stock(pid, qty):
+                    return cart_reply(
+                        f"Only {product['stock']} in stock for {product['name']}", "error", urls["products"], 409
+                    )
             
-            cart = session.get("cart", {})
-            cart[str(pid)] = cart.get(str(pid), 0) + qty
-            session["cart"] = cart
+                cart = session.get("cart", {})
+                cart[str(pid)] = cart.get(str(pid), 0) + qty
+                session["cart"] = cart
             
-            if OBSERVABILITY_ENABLED:
-                app_logger.info(
-                    "Item added to cart",
-                    product_id=pid,
-                    product_name=product['name'],
-                    quantity=qty,
-                    user_id=session.get('user_id')
-                )
+                if OBSERVABILITY_ENABLED:
+                    app_logger.info(
+                        "Item added to cart",
+                        product_id=pid,
+                        product_name=product['name'],
+                        quantity=qty,
+                        user_id=session.get('user_id')
+                    )
             
-            flash(f"Added {qty} x {product['name']} to cart", "info")
-            return redirect(url_for("cart_view"))
+                return cart_reply(f"Added {qty} x {product['name']} to cart", "info", urls["cart_view"])
             
-        except ValueError:
-            flash("Invalid product ID", "error")
-            return redirect(url_for("products"))
-        finally:
-            conn.close()
+            except ValueError:
+                return cart_reply("Invalid product ID", "error", urls["products"], 400)
 
     @app.get("/cart")
     def cart_view():
         cart: Dict[str, int] = session.get("cart", {})
-        conn = get_conn()
         items = []
         total = 0
-        try:
-            repo = AProductRepo(conn)
+        with pool.connection() as conn:
+            repo = get_product_repo(conn)
+            products_by_id = repo.get_products_bulk([int(pid_str) for pid_str in cart])
             for pid_str, qty in cart.items():
                 pid = int(pid_str)
-                prod = repo.get_product(pid)
-                
+                prod = products_by_id.get(pid)
+            
                 if not prod:
                     continue
-                
+            
                 unit = int(prod["price_cents"])
-                items.append({
-                    "id": pid,
-                    "name": prod["name"],
-                    "qty": qty,
-                    "unit": unit,
-                    "line": unit * qty,
-                    "is_flash_sale": prod.get("is_flash_sale", False),
-                    "original_price": prod.get("original_price", unit)
-                })
+                items.append(CartLine(
+                    pid,
+                    prod["name"],
+                    qty,
+                    unit,
+                    unit * qty,
+                    prod.get("is_flash_sale", False),
+                    prod.get("original_price", unit),
+                ))
                 total += unit * qty
-        finally:
-            conn.close()
         return render_template("cart.html", items=items, total=total)
 
     @app.post("/cart/clear")
     def cart_clear():
         session.pop("cart", None)
-        flash("Cart cleared", "info")
-        return redirect(url_for("products"))
+        return cart_reply("Cart cleared", "info", urls["products"])
 
     @app.post("/cart/remove")
     def cart_remove():
@@ -389,9 +645,11 @@ def create_app() -> Flask:
         if pid in cart:
             del cart[pid]
             session["cart"] = cart
-            flash("Item removed from cart", "info")
+            return cart_reply("Item removed from cart", "info", urls["cart_view"])
         
-        return redirect(url_for("cart_view"))
+        if wants_json():
+            return jsonify({"ok": False, "error": "Item not in cart"}), 404
+        return redirect(urls["cart_view"])
 
     @app.route("/login", methods=["GET", "POST"])
     def login():
@@ -400,19 +658,22 @@ def create_app() -> Flask:
             password = request.form["password"]
             selected_role = request.form.get("role", "customer")  # Get the selected role
             
-            conn = get_conn()
-            try:
-                user = conn.execute(
-                    "SELECT id, username, password, name FROM user WHERE username = ?", 
-                    (username,)
-                ).fetchone()
+            with pool.connection() as conn:
+                user = conn.execute(_SQL_USER_BY_USERNAME, (username,)).fetchone()
                 
                 if user:
                     try:
-                        ok = check_password_hash(user["password"], password)
+                        ok = verify_password(user["password"], password)
                     except ValueError as e:
                         flash("Your account uses an unsupported password hash. Please reset your password or contact support.", "error")
                         ok = False
+                    if ok and needs_rehash(user["password"]):
+                        # Upgrade legacy pbkdf2 hashes while we have the plaintext
+                        try:
+                            conn.execute(_SQL_USER_SET_PASSWORD, (hash_password(password), user["id"]))
+                            conn.commit()
+                        except sqlite3.Error:
+                            conn.rollback()
                     if ok:
                         # Check if this is an admin user (name starts with "Admin: ")
                         is_admin_user = user["name"] and user["name"].startswith("Admin: ")
@@ -468,13 +729,14 @@ def create_app() -> Flask:
                         
                         flash("Login successful!", "success")
                         return redirect(url_for("dashboard"))
+                else:
+                    # Match the timing of a failed password check without running the KDF
+                    unknown_user_delay()
                 
                 if OBSERVABILITY_ENABLED:
                     app_logger.warning("Failed login attempt", username=username)
                 
                 flash("Invalid username or password", "error")
-            finally:
-                conn.close()
         
         return render_template("login.html")
 
@@ -504,14 +766,10 @@ def create_app() -> Flask:
         end_date = request.args.get('end_date', '').strip()
         search_query = request.args.get('search', '').strip()
         
-        conn = get_conn()
-        try:
+        with pool.connection() as conn:
             # Fetch current username from database - always use database, never session
             # This ensures admin login doesn't affect what username is displayed
-            user = conn.execute(
-                "SELECT username, name FROM user WHERE id = ?",
-                (user_id,)
-            ).fetchone()
+            user = conn.execute(_SQL_USER_NAME_BY_ID, (user_id,)).fetchone()
             
             if user:
                 username = user["username"]
@@ -528,154 +786,81 @@ def create_app() -> Flask:
             else:
                 username = "User"
             
-            # Build dynamic SQL query with filters
-            query = """
-                SELECT s.id, s.sale_time as created_at, s.status, 
-                       s.total_cents / 100.0 as total,
-                       GROUP_CONCAT(p.name || ' (' || si.quantity || 'x)', ', ') as items_summary
-                FROM sale s
-                LEFT JOIN sale_item si ON s.id = si.sale_id
-                LEFT JOIN product p ON si.product_id = p.id
-                WHERE s.user_id = ?
-            """
+            # Pick the canonical SQL for this filter combination
             params = [user_id]
-            
-            # Apply status filter (including RMA-related statuses)
-            if status_filter:
-                if status_filter in ['COMPLETED', 'PENDING', 'PROCESSING', 'CANCELLED', 'REFUNDED']:
-                    query += " AND s.status = ?"
-                    params.append(status_filter)
-                elif status_filter == 'RETURNED':
-                    # For RETURNED status, find orders with completed RMAs
-                    query += """ AND s.id IN (
-                        SELECT sale_id FROM rma_requests 
-                        WHERE status = 'COMPLETED' AND disposition IN ('REFUND', 'REPLACEMENT', 'REPAIR', 'STORE_CREDIT')
-                    )"""
-            
-            # Apply date range filter
+            status_mode = None
+            if status_filter in ('COMPLETED', 'PENDING', 'PROCESSING', 'CANCELLED', 'REFUNDED'):
+                status_mode = 'status'
+                params.append(status_filter)
+            elif status_filter == 'RETURNED':
+                status_mode = 'returned'
             if start_date:
-                query += " AND DATE(s.sale_time) >= ?"
                 params.append(start_date)
             if end_date:
-                query += " AND DATE(s.sale_time) <= ?"
                 params.append(end_date)
-            
-            # Apply search filter (by order ID or product name)
             if search_query:
-                query += """ AND (
-                    CAST(s.id AS TEXT) LIKE ? OR
-                    s.id IN (
-                        SELECT DISTINCT si2.sale_id 
-                        FROM sale_item si2
-                        JOIN product p2 ON si2.product_id = p2.id
-                        WHERE p2.name LIKE ?
-                    )
-                )"""
                 search_pattern = f"%{search_query}%"
                 params.extend([search_pattern, search_pattern])
+            query = _dashboard_orders_sql(status_mode, bool(start_date), bool(end_date), bool(search_query))
             
-            query += " GROUP BY s.id ORDER BY s.sale_time DESC"
-            
-            # Get all user orders with items (filtered)
-            orders = conn.execute(query, params).fetchall()
+            # Get all user orders with items (filtered), as DashboardOrder tuples
+            cursor = conn.cursor()
+            cursor.row_factory = _dashboard_order_row
+            orders = cursor.execute(query, params).fetchall()
             
-            # Get items for each order
-            orders_with_items = []
-            for order in orders:
-                items_rows = conn.execute("""
+            # Fetch the items of every listed order in one query
+            items_by_sale = {}
+            replacement_ids = set()
+            if orders:
+                sale_ids = [order.id for order in orders]
+                placeholders = ",".join("?" * len(sale_ids))
+                items_rows = conn.execute(f"""
                     SELECT si.*, p.name as product_name
                     FROM sale_item si
                     JOIN product p ON si.product_id = p.id
-                    WHERE si.sale_id = ?
-                """, (order["id"],)).fetchall()
-                
-                # Convert Row objects to dicts for template
-                items_list = [dict(item) for item in items_rows]
+                    WHERE si.sale_id IN ({placeholders})
+                    ORDER BY si.sale_id, si.id
+                """, sale_ids).fetchall()
+                items_by_sale = {
+                    sale_id: [dict(item) for item in rows]
+                    for sale_id, rows in groupby(items_rows, key=itemgetter("sale_id"))
+                }
                 
-                # Check if this is a replacement order (created by an RMA)
-                is_replacement = conn.execute("""
-                    SELECT COUNT(*) as count
+                # Orders created by an RMA replacement
+                replacement_ids = {row[0] for row in conn.execute(f"""
+                    SELECT replacement_sale_id
                     FROM rma_activity_log
-                    WHERE notes LIKE ?
-                """, (f"%Replacement order created: #{order['id']}%",)).fetchone()
-                
-                # Check if this order already has an RMA request
-                has_rma = conn.execute("""
-                    SELECT COUNT(*) as count
-                    FROM rma_requests
-                    WHERE sale_id = ?
-                """, (order["id"],)).fetchone()
-
+                    WHERE replacement_sale_id IN ({placeholders})
+                """, sale_ids)}
+            
+            orders_with_items = []
+            for order in orders:
                 # Compute display status based on RMA disposition
-                # Check for active (in-progress) RMAs first
-                active_rma = conn.execute("""
-                    SELECT disposition, status
-                    FROM rma_requests
-                    WHERE sale_id = ? AND status NOT IN ('COMPLETED','REJECTED','CANCELLED')
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                """, (order["id"],)).fetchone()
-                
-                # Check for completed RMAs to show final outcome
-                completed_rma = conn.execute("""
-                    SELECT disposition, status
-                    FROM rma_requests
-                    WHERE sale_id = ? AND status = 'COMPLETED'
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                """, (order["id"],)).fetchone()
+                active_disposition = order.active_disposition
+                completed_disposition = order.completed_disposition
                 
-                # Check for rejected RMAs
-                rejected_rma = conn.execute("""
-                    SELECT disposition, status
-                    FROM rma_requests
-                    WHERE sale_id = ? AND status = 'REJECTED'
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                """, (order["id"],)).fetchone()
-                
-                display_status = order["status"]
+                display_status = order.status
                 
                 # Active RMA takes precedence (show in-progress status)
-                if active_rma:
-                    if active_rma["disposition"] == "REPAIR":
-                        display_status = "REPAIRING"
-                    elif active_rma["disposition"] == "REPLACEMENT":
-                        display_status = "REPLACING"
-                    elif active_rma["disposition"] == "REFUND":
-                        display_status = "REFUNDING"
-                    elif active_rma["disposition"] == "STORE_CREDIT":
-                        display_status = "STORE_CREDIT"
-                    elif active_rma["disposition"] == "REJECT":
-                        display_status = "RETURN_REJECTED"
+                if active_disposition is not None:
+                    display_status = _RMA_ACTIVE_DISPLAY_STATUS.get(active_disposition, display_status)
                 # Rejected RMA shows rejection
-                elif rejected_rma:
+                elif order.has_rejected_rma:
                     display_status = "RETURN_REJECTED"
                 # Completed RMA shows final outcome
-                elif completed_rma and order["status"] == "COMPLETED":
-                    if completed_rma["disposition"] == "REPAIR":
-                        display_status = "REPAIRED"
-                    elif completed_rma["disposition"] == "REPLACEMENT":
-                        display_status = "REPLACED"
-                    elif completed_rma["disposition"] == "STORE_CREDIT":
-                        display_status = "CREDITED"
-                    elif completed_rma["disposition"] == "REFUND":
-                        display_status = "REFUNDED"
-                    elif completed_rma["disposition"] == "REJECT":
-                        display_status = "RETURN_REJECTED"
-                # If order status is already REFUNDED, keep it
-                elif order["status"] == "REFUNDED":
-                    display_status = "REFUNDED"
+                elif completed_disposition is not None and display_status == "COMPLETED":
+                    display_status = _RMA_COMPLETED_DISPLAY_STATUS.get(completed_disposition, display_status)
+                # An order already REFUNDED keeps that status
                 
                 orders_with_items.append({
-                    "id": order["id"],
-                    "created_at": order["created_at"],
-                    "status": order["status"],
+                    "id": order.id,
+                    "created_at": order.created_at,
+                    "status": order.status,
                     "display_status": display_status,
-                    "total": order["total"],
-                    "items": items_list,
-                    "is_replacement": is_replacement["count"] > 0,
-                    "has_rma": has_rma["count"] > 0
+                    "total": order.total,
+                    "items": items_by_sale.get(order.id, []),
+                    "is_replacement": order.id in replacement_ids,
+                    "has_rma": bool(order.has_rma)
                 })
             
             # Calculate stats (based on ALL orders, not just filtered)
@@ -709,8 +894,6 @@ def create_app() -> Flask:
                 stats["store_credit"] = (store_credit_result["total_credit"] or 0) / 100.0
             except:
                 pass  # RMA table might not exist yet
-        finally:
-            conn.close()
             
             return render_template("dashboard.html", 
                                  username=username, 
@@ -732,9 +915,7 @@ def create_app() -> Flask:
         
         user_id = session["user_id"]
         
-        from src.notifications import NotificationService
-        conn = get_conn()
-        try:
+        with pool.connection() as conn:
             # Get all notifications
             all_notifications = NotificationService.get_user_notifications(conn, user_id, unread_only=False, limit=100)
             unread_count = NotificationService.get_unread_count(conn, user_id)
@@ -742,8 +923,6 @@ def create_app() -> Flask:
             return render_template("notifications.html",
                                  notifications=all_notifications,
                                  unread_count=unread_count)
-        finally:
-            conn.close()
     
     @app.route("/notifications/mark-read/<int:notification_id>", methods=["POST"])
     def mark_notification_read(notification_id: int):
@@ -753,14 +932,10 @@ def create_app() -> Flask:
         
         user_id = session["user_id"]
         
-        from src.notifications import NotificationService
-        conn = get_conn()
-        try:
+        with pool.connection() as conn:
             success = NotificationService.mark_as_read(conn, notification_id, user_id)
             unread_count = NotificationService.get_unread_count(conn, user_id)
             return jsonify({"success": success, "unread_count": unread_count})
-        finally:
-            conn.close()
     
     @app.route("/notifications/mark-all-read", methods=["POST"])
     def mark_all_notifications_read():
@@ -770,13 +945,9 @@ def create_app() -> Flask:
         
         user_id = session["user_id"]
         
-        from src.notifications import NotificationService
-        conn = get_conn()
-        try:
+        with pool.connection() as conn:
             count = NotificationService.mark_all_as_read(conn, user_id)
             return jsonify({"success": True, "count": count, "unread_count": 0})
-        finally:
-            conn.close()
     
     @app.route("/api/notifications/count")
     def get_notification_count():
@@ -786,13 +957,9 @@ def create_app() -> Flask:
         
         user_id = session["user_id"]
         
-        from src.notifications import NotificationService
-        conn = get_conn()
-        try:
+        with pool.connection() as conn:
             count = NotificationService.get_unread_count(conn, user_id)
             return jsonify({"count": count})
-        finally:
-            conn.close()
 
     @app.route("/register", methods=["GET", "POST"])
     def register():
@@ -801,17 +968,13 @@ def create_app() -> Flask:
             username = request.form["username"]
             password = request.form["password"]
             
-            conn = get_conn()
-            try:
-                existing = conn.execute("SELECT id FROM user WHERE username = ?", (username,)).fetchone()
+            with pool.connection() as conn:
+                existing = conn.execute(_SQL_USER_EXISTS, (username,)).fetchone()
                 if existing:
                     flash("Username already exists", "error")
                 else:
-                    hashed_password = generate_password_hash(password, method="pbkdf2:sha256")
-                    conn.execute(
-                        "INSERT INTO user (name, username, password) VALUES (?, ?, ?)",
-                        (name, username, hashed_password)
-                    )
+                    hashed_password = hash_password(password)
+                    conn.execute(_SQL_USER_INSERT, (name, username, hashed_password))
                     conn.commit()
                     
                     if OBSERVABILITY_ENABLED:
@@ -819,8 +982,6 @@ def create_app() -> Flask:
                     
                     flash("Registration successful! Please login.", "success")
                     return redirect(url_for("login"))
-            finally:
-                conn.close()
         
         return render_template("register.html")
 
@@ -844,43 +1005,46 @@ def create_app() -> Flask:
             return redirect(url_for("register"))
         
         # Create admin account in database
-        conn = get_conn()
-        try:
-            # Check if admin username already exists
-            existing = conn.execute("SELECT id FROM user WHERE username = ?", (admin_username,)).fetchone()
-            if existing:
-                flash("Admin username already exists. Choose a different username.", "error")
-                return redirect(url_for("register"))
+        with pool.connection() as conn:
+            try:
+                # Check if admin username already exists
+                existing = conn.execute(_SQL_USER_EXISTS, (admin_username,)).fetchone()
+                if existing:
+                    flash("Admin username already exists. Choose a different username.", "error")
+                    return redirect(url_for("register"))
             
-            # Create admin user with a flag to identify them as admin
-            hashed_password = generate_password_hash(admin_password, method="pbkdf2:sha256")
-            conn.execute(
-                "INSERT INTO user (name, username, password) VALUES (?, ?, ?)",
-                (f"Admin: {admin_username}", admin_username, hashed_password)
-            )
-            conn.commit()
+                # Create admin user with a flag to identify them as admin
+                hashed_password = hash_password(admin_password)
+                conn.execute(_SQL_USER_INSERT, (f"Admin: {admin_username}", admin_username, hashed_password))
+                conn.commit()
             
-            # Don't auto-login, redirect to login page
-            flash(f"Admin account '{admin_username}' created successfully! Please login with your new credentials.", "success")
-            return redirect(url_for("login"))
+                # Don't auto-login, redirect to login page
+                flash(f"Admin account '{admin_username}' created successfully! Please login with your new credentials.", "success")
+                return redirect(url_for("login"))
             
-        except Exception as e:
-            flash(f"Error creating admin account: {str(e)}", "error")
-            return redirect(url_for("register"))
-        finally:
-            conn.close()
+            except Exception as e:
+                flash(f"Error creating admin account: {str(e)}", "error")
+                return redirect(url_for("register"))
 
     @app.route("/uploads/rma/<filename>")
     def serve_rma_upload(filename):
         """Serve uploaded RMA photos."""
-        from flask import send_from_directory
-        import os
         upload_dir = os.path.join('/app', 'data', 'uploads', 'rma')
+        accel_prefix = app.config['RMA_UPLOAD_ACCEL_PREFIX']
+        if accel_prefix:
+            # Let the front-end proxy sendfile() the photo instead of
+            # streaming it through this worker
+            if safe_join(upload_dir, filename) is None:
+                abort(404)
+            resp = app.response_class(
+                mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            )
+            resp.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + filename
+            return resp
         return send_from_directory(upload_dir, filename)
 
     # Add login requirement to protected routes
     def login_required(f):
-        from functools import wraps
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if "user_id" not in session:
@@ -905,74 +1069,56 @@ def create_app() -> Flask:
             flash("Cart is empty", "error")
             return redirect(url_for("cart_view"))
 
-        conn = get_conn()
-        repo = get_repo(conn)
+        with pool.connection() as conn:
+            repo = get_repo(conn)
+            # One structured record per checkout, filled in as it progresses
+            event = {"user_id": user_id, "cart_items": len(cart_list), "payment_method": pay_method}
         
-        try:
-            # Calculate total for metrics
-            total_cents = 0
-            for pid, qty in cart_list:
-                prod = conn.execute("SELECT price_cents FROM product WHERE id = ?", (pid,)).fetchone()
-                if prod:
-                    total_cents += prod[0] * qty
-            
-            if OBSERVABILITY_ENABLED:
-                app_logger.info(
-                    "Checkout started",
-                    user_id=user_id,
-                    cart_items=len(cart_list),
-                    total_cents=total_cents,
-                    payment_method=pay_method
-                )
-                metrics_collector.record_event('orders_total')
-            
-            # Use resilient payment with circuit breaker
             try:
-                from .flash_sales.payment_resilience import process_payment_resilient
-                payment_cb = process_payment_resilient
-            except Exception:
-                payment_cb = payment_process
-
-            sale_id = repo.checkout_transaction(
-                user_id=user_id,
-                cart=cart_list,
-                pay_method=pay_method,
-                payment_cb=payment_cb,
-            )
+                # Calculate total for metrics in one statement
+                event["total_cents"] = conn.execute(_SQL_CART_TOTAL, (json.dumps(cart_list),)).fetchone()[0]
             
-            # Success metrics
-            if OBSERVABILITY_ENABLED:
-                metrics_collector.increment_counter('orders_total')
-                metrics_collector.increment_counter('orders_total', labels={'status': 'success'})
-                app_logger.info(
-                    "Checkout completed successfully",
-                    sale_id=sale_id,
+                # Use resilient payment with circuit breaker
+                sale_id = repo.checkout_transaction(
                     user_id=user_id,
-                    total_cents=total_cents
+                    cart=cart_list,
+                    pay_method=pay_method,
+                    payment_cb=checkout_payment,
                 )
             
-            session.pop("cart", None)
-            flash(f"Checkout success. Sale #{sale_id}", "success")
-            return redirect(url_for("receipt", sale_id=sale_id))
+                # Success metrics
+                if OBSERVABILITY_ENABLED:
+                    metrics_collector.record_event('orders_total')
+                    metrics_collector.increment_many([
+                        ('orders_total', None),
+                        ('orders_total', {'status': 'success'}),
+                    ])
+                    app_logger.info("Checkout completed successfully", sale_id=sale_id, **event)
             
-        except Exception as e:
-            # Error metrics
-            if OBSERVABILITY_ENABLED:
-                metrics_collector.increment_counter('orders_total')
-                metrics_collector.increment_counter('orders_total', labels={'status': 'failed'})
-                metrics_collector.increment_counter('errors_total', labels={'type': 'checkout'})
-                metrics_collector.record_event('errors_total')
-                app_logger.error(
-                    "Checkout failed",
-                    user_id=user_id,
-                    error=str(e),
-                    exception_type=type(e).__name__
-                )
+                invalidate_product_cache()
+                session.pop("cart", None)
+                flash(f"Checkout success. Sale #{sale_id}", "success")
+                return redirect(f"{urls['receipt']}{sale_id}")
             
-            flash(str(e), "error")
-            return redirect(url_for("cart_view"))
-        finally:
-            conn.close()
+            except Exception as e:
+                # Error metrics
+                if OBSERVABILITY_ENABLED:
+                    metrics_collector.record_event('orders_total')
+                    metrics_collector.record_event('errors_total')
+                    metrics_collector.increment_many([
+                        ('orders_total', None),
+                        ('orders_total', {'status': 'failed'}),
+                        ('errors_total', {'type': 'checkout'}),
+                    ])
+                    app_logger.error(
+                        "Checkout failed",
+                        error=str(e),
+                        exception_type=type(e).__name__,
+                        **event
+                    )
+            
+                flash(str(e), "error")
+                return redirect(url_for("cart_view"))
 
     @app.post('/partner/ingest')
     def partner_ingest_main():
@@ -980,16 +1126,44 @@ def create_app() -> Flask:
         if not api_key:
             return ("Missing API key", 401)
 
-        conn_check = get_conn()
-        try:
-            cur = conn_check.execute('SELECT partner_id FROM partner_api_keys WHERE api_key = ?', (api_key,))
-            row = cur.fetchone()
-            if not row:
-                return ("Invalid API key", 401)
-        finally:
-            conn_check.close()
+        partner_id = lookup_partner_id(api_key)
+        if partner_id is None:
+            return ("Invalid API key", 401)
 
         content_type = request.content_type or ''
+        async_mode = request.args.get('async') in ('1', 'true', 'yes')
+
+        # Formats with a stream adapter are parsed and upserted batch by batch
+        # straight off the request body instead of buffering the whole upload
+        stream_type = 'text/csv' if content_type == 'text/plain' else content_type.split(';', 1)[0].strip()
+        stream_adapter = None if async_mode else get_stream_adapter(stream_type)
+        if stream_adapter:
+            ingested = 0
+            errors = []
+            seen = 0
+            with pool.connection() as conn:
+                # Let the WAL grow across batches rather than checkpointing after
+                # nearly every batch commit; restored before the connection is pooled
+                conn.execute("PRAGMA wal_autocheckpoint = 10000")
+                try:
+                    for batch in stream_adapter(request.stream):
+                        valid_items, validation_errors = validate_products(batch, start=seen)
+                        seen += len(batch)
+                        errors.extend(validation_errors)
+                        if valid_items:
+                            upserted, upsert_errors = upsert_products(conn, valid_items)
+                            ingested += upserted
+                            errors.extend(upsert_errors)
+                except Exception as e:
+                    # Earlier batches are already committed; report how far we got
+                    errors.append(f'Adapter parse error: {e}')
+                    return ({'ingested': ingested, 'errors': errors}, 400)
+                finally:
+                    if ingested:
+                        invalidate_product_cache()
+                    conn.execute("PRAGMA wal_autocheckpoint = 1000")
+            return ({'ingested': ingested, 'errors': errors}, 200)
+
         payload = request.get_data()
         adapter = get_adapter(content_type)
         if not adapter:
@@ -1005,191 +1179,163 @@ def create_app() -> Flask:
         except Exception as e:
             return (f'Adapter parse error: {e}', 400)
 
+        # ?async=1 hands validation and upsert to the background ingest worker
+        if async_mode:
+            feed_hash = hashlib.sha256(payload).hexdigest()
+            job_id = enqueue_feed_db(db_path, partner_id, products, feed_hash=feed_hash)
+            return ({'job_id': job_id, 'status': 'queued', 'status_url': f'/partners/jobs/{job_id}'}, 202)
+
         valid_items, validation_errors = validate_products(products)
         ingested = 0
         errors = validation_errors[:]
         if valid_items:
-            conn = get_conn()
-            try:
-                upserted, upsert_errors = upsert_products(conn, valid_items)
-                ingested = upserted
-                errors.extend(upsert_errors)
-            finally:
-                conn.close()
+            with pool.connection() as conn:
+                try:
+                    upserted, upsert_errors = upsert_products(conn, valid_items)
+                    ingested = upserted
+                    errors.extend(upsert_errors)
+                finally:
+                    invalidate_product_cache()
 
         return ({'ingested': ingested, 'errors': errors}, 200)
 
     @app.get("/receipt/<int:sale_id>")
     def receipt(sale_id: int):
-        conn = get_conn()
-        try:
-            sale = conn.execute(
-                "SELECT id, user_id, sale_time, total_cents, status FROM sale WHERE id = ?",
-                (sale_id,),
-            ).fetchone()
+        with pool.connection() as conn:
+            # Sale, line items and payment in one round-trip: one row per item
+            # (or a single row with NULL item columns for an empty sale)
+            rows = conn.execute(_SQL_RECEIPT, (sale_id,)).fetchall()
+            sale = payment = None
+            items = []
+            if rows:
+                first = rows[0]
+                sale = {k: first[k] for k in ("id", "user_id", "sale_time", "total_cents", "status")}
+                if first["pay_method"] is not None:
+                    payment = {
+                        "method": first["pay_method"],
+                        "amount_cents": first["pay_amount_cents"],
+                        "status": first["pay_status"],
+                        "ref": first["pay_ref"],
+                    }
+                items = [
+                    {k: r[k] for k in ("product_id", "product_name", "quantity", "price_cents")}
+                    for r in rows
+                    if r["product_name"] is not None
+                ]
             # Compute display status based on RMA disposition
             display_status = sale["status"] if sale else ""
             try:
-                # Check for active (in-progress) RMAs first
-                active_rma = conn.execute(
-                    """
-                    SELECT disposition, status
-                    FROM rma_requests
-                    WHERE sale_id = ? AND status NOT IN ('COMPLETED','REJECTED','CANCELLED')
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                    """,
-                    (sale_id,),
-                ).fetchone()
-                
-                # Check for completed RMAs to show final outcome
-                completed_rma = conn.execute(
-                    """
-                    SELECT disposition, status
-                    FROM rma_requests
-                    WHERE sale_id = ? AND status = 'COMPLETED'
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                    """,
-                    (sale_id,),
-                ).fetchone()
-                
-                # Check for rejected RMAs
-                rejected_rma = conn.execute(
-                    """
-                    SELECT disposition, status
-                    FROM rma_requests
-                    WHERE sale_id = ? AND status = 'REJECTED'
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                    """,
-                    (sale_id,),
-                ).fetchone()
-                
-                # Active RMA takes precedence (show in-progress status)
-                if active_rma:
-                    if active_rma["disposition"] == "REPAIR":
-                        display_status = "REPAIRING"
-                    elif active_rma["disposition"] == "REPLACEMENT":
-                        display_status = "REPLACING"
-                    elif active_rma["disposition"] == "REFUND":
-                        display_status = "REFUNDING"
-                    elif active_rma["disposition"] == "STORE_CREDIT":
-                        display_status = "STORE_CREDIT"
-                    elif active_rma["disposition"] == "REJECT":
+                rma = conn.execute(_SQL_RECEIPT_RMA, (sale_id,)).fetchone()
+                if rma is not None:
+                    if rma["bucket"] == 2:
                         display_status = "RETURN_REJECTED"
-                # Rejected RMA shows rejection
-                elif rejected_rma:
-                    display_status = "RETURN_REJECTED"
-                # Completed RMA shows final outcome
-                elif completed_rma and sale["status"] == "COMPLETED":
-                    if completed_rma["disposition"] == "REPAIR":
-                        display_status = "REPAIRED"
-                    elif completed_rma["disposition"] == "REPLACEMENT":
-                        display_status = "REPLACED"
-                    elif completed_rma["disposition"] == "STORE_CREDIT":
-                        display_status = "CREDITED"
+                    # A completed RMA only relabels a sale that is still COMPLETED
+                    elif rma["bucket"] == 1 or sale["status"] == "COMPLETED":
+                        display_status = _RECEIPT_RMA_DISPLAY_STATUS.get(
+                            (rma["disposition"], rma["bucket"]), display_status
+                        )
             except Exception:
                 # rma tables may not exist in some setups
                 pass
-            items = conn.execute(
-                "SELECT si.product_id, p.name as product_name, si.quantity, si.price_cents "
-                "FROM sale_item si JOIN product p ON si.product_id = p.id "
-                "WHERE si.sale_id = ?",
-                (sale_id,),
-            ).fetchall()
-            payment = conn.execute(
-                "SELECT method, amount_cents, status, ref FROM payment WHERE sale_id = ?",
-                (sale_id,),
-            ).fetchone()
-        finally:
-            conn.close()
         return render_template("receipt.html", sale=sale, items=items, payment=payment, display_status=display_status)
 
     @app.get("/admin/flash-sale")
     def admin_flash_sale():
         """Admin page to manage flash sales"""
-        conn = get_conn()
-        try:
-            cursor = conn.execute("""
-                SELECT id, name, price_cents, flash_sale_active, flash_sale_price_cents
-                FROM product 
-                WHERE active = 1
-                ORDER BY name
-            """)
-            products = cursor.fetchall()
-            return render_template("admin_flash_sale.html", products=products)
-        finally:
-            conn.close()
+        # Shares product_cache (and its TTL); product writers clear it through
+        # invalidate_product_cache()
+        products = product_cache.get("admin_flash_products") if product_cache is not None else None
+        if products is None:
+            with pool.connection() as conn:
+                products = conn.execute(_SQL_FLASH_SALE_PRODUCTS).fetchall()
+            if product_cache is not None:
+                product_cache.set("admin_flash_products", products)
+        return render_template("admin_flash_sale.html", products=products)
 
     @app.post("/admin/flash-sale/set")
     def admin_flash_sale_set():
-        """Set a product as flash sale"""
-        product_id = request.form.get("product_id")
-        flash_price = request.form.get("flash_price")
+        """Set one or more products as flash sale (repeated product_id/flash_price fields)"""
+        product_ids = request.form.getlist("product_id")
+        flash_prices = request.form.getlist("flash_price")
         
         # Validate inputs
-        if not product_id or not flash_price:
+        if not product_ids or len(product_ids) != len(flash_prices) or not all(product_ids) or not all(flash_prices):
             flash("Please provide both product ID and flash price", "error")
             return redirect(url_for("admin_flash_sale"))
         
+        updates = []
         try:
-            product_id = int(product_id)
-            flash_price = float(flash_price)
-            if flash_price <= 0:
-                flash("Flash price must be greater than 0", "error")
-                return redirect(url_for("admin_flash_sale"))
+            for product_id, flash_price in zip(product_ids, flash_prices):
+                product_id = int(product_id)
+                flash_price = float(flash_price)
+                if flash_price <= 0:
+                    flash("Flash price must be greater than 0", "error")
+                    return redirect(url_for("admin_flash_sale"))
+                updates.append((int(flash_price * 100), product_id))
         except (ValueError, TypeError):
             flash("Invalid product ID or flash price", "error")
             return redirect(url_for("admin_flash_sale"))
         
-        flash_price_cents = int(flash_price * 100)
-        
-        conn = get_conn()
-        try:
-            conn.execute("""
-                UPDATE product 
-                SET flash_sale_active = 1, flash_sale_price_cents = ?
-                WHERE id = ?
-            """, (flash_price_cents, product_id))
-            conn.commit()
+        with pool.connection() as conn:
+            # One transaction for the whole batch
+            with conn:
+                conn.executemany(_SQL_FLASH_SALE_SET, updates)
+            invalidate_product_cache()
             
             if OBSERVABILITY_ENABLED:
                 app_logger.info(
                     "Flash sale activated",
-                    product_id=product_id,
-                    flash_price_cents=flash_price_cents
+                    product_ids=[product_id for _, product_id in updates],
+                    flash_price_cents=[price for price, _ in updates]
                 )
             
             flash("Flash sale activated!", "success")
-        finally:
-            conn.close()
         
         return redirect(url_for("admin_flash_sale"))
 
     @app.post("/admin/flash-sale/remove")
     def admin_flash_sale_remove():
-        """Remove flash sale from product"""
-        product_id = int(request.form.get("product_id"))
+        """Remove flash sale from one or more products"""
+        product_ids = [int(product_id) for product_id in request.form.getlist("product_id")]
         
-        conn = get_conn()
-        try:
-            conn.execute("""
-                UPDATE product 
-                SET flash_sale_active = 0, flash_sale_price_cents = NULL
-                WHERE id = ?
-            """, (product_id,))
-            conn.commit()
+        with pool.connection() as conn:
+            with conn:
+                conn.executemany(_SQL_FLASH_SALE_CLEAR, [(product_id,) for product_id in product_ids])
+            invalidate_product_cache()
             
             if OBSERVABILITY_ENABLED:
-                app_logger.info("Flash sale removed", product_id=product_id)
+                app_logger.info("Flash sale removed", product_ids=product_ids)
             
             flash("Flash sale removed", "info")
-        finally:
-            conn.close()
         
         return redirect(url_for("admin_flash_sale"))
 
+    url_adapter = app.url_map.bind("", script_name=app.config.get("APPLICATION_ROOT") or "/")
+    for endpoint in ("products", "login", "cart_view"):
+        urls[endpoint] = url_adapter.build(endpoint)
+    # Receipt prefix ("/receipt/"); callers append the sale id
+    urls["receipt"] = url_adapter.build("receipt", {"sale_id": 0})[:-1]
+
+    # Answer liveness probes before Flask's request pipeline (sessions,
+    # observability hooks, routing) runs; the /health route stays for url_for.
+    flask_wsgi_app = app.wsgi_app
+
+    def health_short_circuit(environ, start_response):
+        if environ.get("PATH_INFO") == "/health" and environ.get("REQUEST_METHOD") in ("GET", "HEAD"):
+            body = b'{"status":"healthy","timestamp":%f,"version":"1.0.0"}' % time.time()
+            start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+            return [b""] if environ["REQUEST_METHOD"] == "HEAD" else [body]
+        return flask_wsgi_app(environ, start_response)
+
+    app.wsgi_app = health_short_circuit
+
+    # Compile every page up front so no first request pays for parsing.
+    # Flask already leaves jinja_env.auto_reload off outside debug mode, so
+    # cached templates are not re-stat()ed per render in production.
+    if app.config['PRECOMPILE_TEMPLATES']:
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+
     return app
 
 
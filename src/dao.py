@@ -1,21 +1,154 @@
 from __future__ import annotations
 
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
-from typing import Callable, Iterable, List, Tuple
+from typing import Callable, Dict, Iterable, List, Tuple
 
 
 CartItem = Tuple[int, int]  # (product_id, qty)
 PaymentCallback = Callable[[str, int], Tuple[str, str | None]]
 
 
+# Seconds a connection waits on a locked database before raising
+# "database is locked"; WAL writers queue briefly behind each other
+BUSY_TIMEOUT_SECONDS = 30.0
+
+
 def get_connection(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
 
+# Per-connection tuning applied once when a pooled connection is opened.
+POOL_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    # Page cache ceiling of 64 MiB (negative = KiB); filled lazily
+    "PRAGMA cache_size = -65536",
+)
+
+# Prepared statements kept per pooled connection (sqlite3 defaults to 128);
+# room for every repo query plus the dashboard filter variants
+POOL_CACHED_STATEMENTS = 512
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of reusable SQLite connections for one database file.
+
+    Connections are opened with check_same_thread=False so request threads can
+    share them; each connection is only ever used by one thread at a time.
+    When the pool is empty a fresh connection is opened, and connections
+    released into a full pool are closed, so callers never block.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = 8):
+        self.db_path = db_path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=max_idle)
+        # Lifetime open/close counts; only touched when a connection is
+        # created or discarded, never on the acquire/release fast path
+        self._stats_lock = threading.Lock()
+        self._opened = 0
+        self._closed = 0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=POOL_CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        for pragma in POOL_PRAGMAS:
+            conn.execute(pragma)
+        with self._stats_lock:
+            self._opened += 1
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._stats_lock:
+            self._closed += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            # Never hand out a connection with a half-finished transaction
+            conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of pool usage: connections borrowed, idle, and open in total."""
+        idle = self._idle.qsize()
+        with self._stats_lock:
+            total = self._opened - self._closed
+        return {
+            "active": max(total - idle, 0),
+            "idle": idle,
+            "total": total,
+            "max_idle": self._idle.maxsize,
+        }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Return the process-wide pool for db_path, creating it on first use."""
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(db_path, ConnectionPool(db_path))
+    return pool
+
+
+def fetch_dicts(conn: sqlite3.Connection, sql: str, params: Iterable = ()) -> List[Dict]:
+    """Run a query and return its rows as plain dicts.
+
+    For read paths that would call dict(row) anyway: rows come back as bare
+    tuples (no sqlite3.Row objects) and column names are read once per
+    statement rather than looked up per field.
+    """
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.execute(sql, tuple(params))
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur]
+
+
 @contextmanager
 def transaction(conn: sqlite3.Connection):
     # BEGIN IMMEDIATE to lock for stock-consistency (A5)
@@ -1,16 +1,25 @@
+import time
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import datetime
 from enum import Enum
 from typing import Callable, Any
 from threading import Lock
 
-# Import observability with fallback
+# Import observability with fallback; without it both names are no-op stand-ins,
+# decided once here instead of branching on every breaker event
 try:
     from src.observability.metrics_collector import metrics_collector
     from src.observability.structured_logger import app_logger
-    OBSERVABILITY_ENABLED = True
 except ImportError:
-    OBSERVABILITY_ENABLED = False
+    def _noop(*args, **kwargs):
+        return None
+
+    class _NoOpObservability:
+        """Accepts any metrics/logging call and does nothing."""
+        def __getattr__(self, name):
+            return _noop
+
+    metrics_collector = app_logger = _NoOpObservability()
 
 
 class CircuitState(Enum):
@@ -36,12 +45,31 @@ class CircuitBreaker:
         
         self.failure_count = 0
         self.success_count = 0
+        # Monotonic seconds for the reset timeout; wall-clock epoch seconds
+        # only for get_metrics(), converted to a datetime when read
         self.last_failure_time = None
+        self.last_failure_wall = None
         self.state = CircuitState.CLOSED
         self.lock = Lock()
     
     def call(self, func: Callable, *args, **kwargs) -> Any:
         """Execute function through circuit breaker"""
+        # Fast path: a CLOSED breaker admits every call, so only take the
+        # lock when the (unlocked, GIL-atomic) state read says otherwise
+        if self.state is not CircuitState.CLOSED:
+            self._before_call()
+        
+        # Execute function outside the lock
+        try:
+            result = func(*args, **kwargs)
+            self._on_success()
+            return result
+        except Exception as e:
+            self._on_failure(e)
+            raise
+    
+    def _before_call(self):
+        """Admit or reject a call while OPEN / HALF_OPEN"""
         with self.lock:
             if self.state == CircuitState.OPEN:
                 if self._should_attempt_reset():
@@ -49,52 +77,44 @@ class CircuitBreaker:
                     self.success_count = 0
                     
                     # NEW: Log state transition
-                    if OBSERVABILITY_ENABLED:
-                        try:
-                            app_logger.info(
-                                f"Circuit breaker '{self.name}' moved to HALF_OPEN",
-                                circuit_name=self.name,
-                                state="HALF_OPEN",
-                                timeout_seconds=self.timeout_seconds
-                            )
-                            metrics_collector.increment_counter(
-                                'circuit_breaker_state_changes',
-                                labels={'circuit': self.name, 'new_state': 'HALF_OPEN'}
-                            )
-                        except Exception:
-                            # Observability failed, continue anyway
-                            pass
+                    try:
+                        app_logger.info(
+                            f"Circuit breaker '{self.name}' moved to HALF_OPEN",
+                            circuit_name=self.name,
+                            state="HALF_OPEN",
+                            timeout_seconds=self.timeout_seconds
+                        )
+                        metrics_collector.increment_counter(
+                            'circuit_breaker_state_changes',
+                            labels={'circuit': self.name, 'new_state': 'HALF_OPEN'}
+                        )
+                    except Exception:
+                        # Observability failed, continue anyway
+                        pass
                 else:
                     # NEW: Track fast-fail rejections
-                    if OBSERVABILITY_ENABLED:
-                        try:
-                            metrics_collector.increment_counter(
-                                'circuit_breaker_rejections',
-                                labels={'circuit': self.name}
-                            )
-                            app_logger.warning(
-                                f"Circuit breaker '{self.name}' is OPEN - request rejected",
-                                circuit_name=self.name,
-                                state="OPEN",
-                                failure_count=self.failure_count
-                            )
-                        except Exception:
-                            # Observability failed, continue anyway
-                            pass
+                    try:
+                        metrics_collector.increment_counter(
+                            'circuit_breaker_rejections',
+                            labels={'circuit': self.name}
+                        )
+                        app_logger.warning(
+                            f"Circuit breaker '{self.name}' is OPEN - request rejected",
+                            circuit_name=self.name,
+                            state="OPEN",
+                            failure_count=self.failure_count
+                        )
+                    except Exception:
+                        # Observability failed, continue anyway
+                        pass
                     
                     raise CircuitBreakerOpenError("Circuit breaker is OPEN")
-        
-        # Execute function outside the lock
-        try:
-            result = func(*args, **kwargs)
-            self._on_success()
-            return result
-        except Exception as e:
-            self._on_failure(e)
-            raise
     
     def _on_success(self):
         """Handle successful call"""
+        # Steady state (CLOSED, no failures recorded) has nothing to update
+        if self.state is CircuitState.CLOSED and not self.failure_count:
+            return
         with self.lock:
             previous_state = self.state
             self.failure_count = 0
@@ -106,39 +126,44 @@ class CircuitBreaker:
                     self.success_count = 0
                     
                     # NEW: Log recovery
-                    if OBSERVABILITY_ENABLED:
-                        try:
-                            app_logger.info(
-                                f"Circuit breaker '{self.name}' CLOSED - recovered",
-                                circuit_name=self.name,
-                                state="CLOSED",
-                                success_count=self.success_threshold
-                            )
-                            metrics_collector.increment_counter(
-                                'circuit_breaker_state_changes',
-                                labels={'circuit': self.name, 'new_state': 'CLOSED'}
-                            )
-                            metrics_collector.increment_counter(
-                                'circuit_breaker_recoveries',
-                                labels={'circuit': self.name}
-                            )
-                        except Exception:
-                            # Observability failed, continue anyway
-                            pass
+                    try:
+                        app_logger.info(
+                            f"Circuit breaker '{self.name}' CLOSED - recovered",
+                            circuit_name=self.name,
+                            state="CLOSED",
+                            success_count=self.success_threshold
+                        )
+                        metrics_collector.increment_many([
+                            ('circuit_breaker_state_changes', {'circuit': self.name, 'new_state': 'CLOSED'}),
+                            ('circuit_breaker_recoveries', {'circuit': self.name}),
+                        ])
+                    except Exception:
+                        # Observability failed, continue anyway
+                        pass
     
     def _on_failure(self, exception: Exception = None):
         """Handle failed call"""
         with self.lock:
             self.failure_count += 1
-            self.last_failure_time = datetime.now()
+            self.last_failure_time = time.monotonic()
+            self.last_failure_wall = time.time()
             
-            # NEW: Track each failure
-            if OBSERVABILITY_ENABLED:
-                try:
-                    metrics_collector.increment_counter(
-                        'circuit_breaker_failures',
-                        labels={'circuit': self.name}
-                    )
+            opened = self.failure_count >= self.failure_threshold
+            if opened:
+                previous_state = self.state
+                self.state = CircuitState.OPEN
+            
+            # NEW: Track each failure (and the opening) with one collector call
+            try:
+                counters = [('circuit_breaker_failures', {'circuit': self.name})]
+                if opened:
+                    counters.append(('circuit_breaker_state_changes', {'circuit': self.name, 'new_state': 'OPEN'}))
+                    counters.append(('circuit_breaker_opens', {'circuit': self.name}))
+                metrics_collector.increment_many(counters)
+                    
+                # Log the first of every 10 failures, and each one at or
+                # past the threshold, so a steady failure rate can't flood the log
+                if self.failure_count % 10 == 1 or opened:
                     app_logger.warning(
                         f"Circuit breaker '{self.name}' failure",
                         circuit_name=self.name,
@@ -146,44 +171,27 @@ class CircuitBreaker:
                         threshold=self.failure_threshold,
                         error=str(exception) if exception else None
                     )
-                except Exception:
-                    # Observability failed, continue anyway
-                    pass
-            
-            if self.failure_count >= self.failure_threshold:
-                previous_state = self.state
-                self.state = CircuitState.OPEN
-                
+                    
                 # NEW: Log circuit opening
-                if OBSERVABILITY_ENABLED:
-                    try:
-                        app_logger.error(
-                            f"Circuit breaker '{self.name}' OPENED",
-                            circuit_name=self.name,
-                            state="OPEN",
-                            failure_count=self.failure_count,
-                            threshold=self.failure_threshold,
-                            timeout_seconds=self.timeout_seconds
-                        )
-                        metrics_collector.increment_counter(
-                            'circuit_breaker_state_changes',
-                            labels={'circuit': self.name, 'new_state': 'OPEN'}
-                        )
-                        metrics_collector.increment_counter(
-                            'circuit_breaker_opens',
-                            labels={'circuit': self.name}
-                        )
-                    except Exception:
-                        # Observability failed, continue anyway
-                        pass
+                if opened:
+                    app_logger.error(
+                        f"Circuit breaker '{self.name}' OPENED",
+                        circuit_name=self.name,
+                        state="OPEN",
+                        failure_count=self.failure_count,
+                        threshold=self.failure_threshold,
+                        timeout_seconds=self.timeout_seconds
+                    )
+            except Exception:
+                # Observability failed, continue anyway
+                pass
     
     def _should_attempt_reset(self) -> bool:
         """Check if enough time has passed to try half-open"""
         if self.last_failure_time is None:
             return True
         
-        elapsed = datetime.now() - self.last_failure_time
-        return elapsed > timedelta(seconds=self.timeout_seconds)
+        return time.monotonic() - self.last_failure_time > self.timeout_seconds
     
     def reset(self):
         """Manually reset circuit breaker"""
@@ -193,23 +201,23 @@ class CircuitBreaker:
             self.failure_count = 0
             self.success_count = 0
             self.last_failure_time = None
+            self.last_failure_wall = None
             
             # NEW: Log manual reset
-            if OBSERVABILITY_ENABLED:
-                try:
-                    app_logger.info(
-                        f"Circuit breaker '{self.name}' manually reset",
-                        circuit_name=self.name,
-                        previous_state=previous_state.value,
-                        new_state="CLOSED"
-                    )
-                    metrics_collector.increment_counter(
-                        'circuit_breaker_resets',
-                        labels={'circuit': self.name}
-                    )
-                except Exception:
-                    # Observability failed, continue anyway
-                    pass
+            try:
+                app_logger.info(
+                    f"Circuit breaker '{self.name}' manually reset",
+                    circuit_name=self.name,
+                    previous_state=previous_state.value,
+                    new_state="CLOSED"
+                )
+                metrics_collector.increment_counter(
+                    'circuit_breaker_resets',
+                    labels={'circuit': self.name}
+                )
+            except Exception:
+                # Observability failed, continue anyway
+                pass
     
     def get_state(self) -> CircuitState:
         """Get current circuit state"""
@@ -224,7 +232,10 @@ class CircuitBreaker:
             'success_count': self.success_count,
             'failure_threshold': self.failure_threshold,
             'timeout_seconds': self.timeout_seconds,
-            'last_failure_time': self.last_failure_time.isoformat() if self.last_failure_time else None
+            'last_failure_time': (
+                datetime.fromtimestamp(self.last_failure_wall).isoformat()
+                if self.last_failure_wall is not None else None
+            )
         }
 
 
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Iterable, Optional, Dict, List, Set
+import json
 import sqlite3
 
 
@@ -39,6 +40,29 @@ class FlashSaleManager:
         
         return start <= now <= end
     
+    def get_active_flash_sales(self, product_ids: Iterable[int]) -> Set[int]:
+        """Return the subset of product_ids with a flash sale active right now (one query)"""
+        now = datetime.now()
+        
+        rows = self.conn.execute(
+            """
+            SELECT id, sale_start, sale_end
+            FROM product
+            WHERE id IN (SELECT value FROM json_each(?))
+              AND active = 1
+              AND flash_price_cents IS NOT NULL
+              AND sale_start IS NOT NULL
+              AND sale_end IS NOT NULL
+            """,
+            (json.dumps(list(product_ids)),)
+        ).fetchall()
+        
+        # Same window check as is_flash_sale_active
+        return {
+            row["id"] for row in rows
+            if datetime.fromisoformat(row["sale_start"]) <= now <= datetime.fromisoformat(row["sale_end"])
+        }
+    
     def get_flash_products(self) -> List[Dict]:
         """Get all products with active flash sales"""
         now = datetime.now().isoformat()
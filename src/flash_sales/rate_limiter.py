@@ -1,44 +1,96 @@
 from functools import wraps
-from flask import request, jsonify
-from datetime import datetime, timedelta
-from collections import defaultdict
+from flask import Response, flash, redirect, request, url_for
+import json
+import math
+import time
 from threading import Lock
 
+# Lock stripes per limiter (power of two); identifiers hash to a shard
+RATE_LIMIT_SHARDS = 64
+# Checks between sweeps of idle identifiers, across all shards of a limiter
+RATE_LIMIT_GC_INTERVAL = 10_000
+
+# Body of every JSON 429; serialized once
+_RATE_LIMIT_JSON = json.dumps({"error": "Rate limit exceeded. Please try again later."}) + "\n"
+
+
+class _Shard:
+    """One lock stripe: its lock, buckets and check count kept together.
+
+    CPython gives no control over object addresses, so shards cannot be
+    padded to cache-line boundaries; each shard is instead a single object
+    rather than an entry in three parallel lists.
+    """
+    __slots__ = ('lock', 'data', 'ops')
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.data = {}
+        self.ops = 0  # checks since the last sweep
+
 
 class RateLimiter:
-    """Simple in-memory rate limiter for flash sale endpoints"""
+    """Simple in-memory rate limiter for flash sale endpoints.
+
+    Token bucket per identifier: up to max_requests may burst at once, and
+    tokens refill continuously at max_requests per window_seconds.
+    """
     
     def __init__(self, max_requests: int = 10, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(list)
-        self.lock = Lock()
+        self.capacity = float(max_requests)
+        self.rate = max_requests / window_seconds  # tokens per second
+        self.rate_ns = self.rate / 1e9  # tokens per nanosecond
+        # Per identifier: (tokens, last refill time from time.monotonic_ns()).
+        # Identifiers are striped over shards with one lock each, so unrelated
+        # clients rarely contend; each shard sweeps itself.
+        self.shards = [_Shard() for _ in range(RATE_LIMIT_SHARDS)]
+        self.shard_gc_interval = max(1, RATE_LIMIT_GC_INTERVAL // RATE_LIMIT_SHARDS)
     
     def is_allowed(self, identifier: str) -> bool:
         """Check if request from identifier is allowed"""
-        with self.lock:
-            now = datetime.now()
-            cutoff = now - timedelta(seconds=self.window_seconds)
-            
-            # Clean old requests
-            self.requests[identifier] = [
-                req_time for req_time in self.requests[identifier]
-                if req_time > cutoff
-            ]
+        shard = self.shards[hash(identifier) & (RATE_LIMIT_SHARDS - 1)]
+        with shard.lock:
+            now = time.monotonic_ns()
+            buckets = shard.data
+            shard.ops += 1
+            if shard.ops >= self.shard_gc_interval:
+                shard.ops = 0
+                self._sweep(buckets, now)
+            state = buckets.get(identifier)
+            if state is None:
+                tokens = self.capacity
+            else:
+                tokens, last = state
+                tokens = min(self.capacity, tokens + (now - last) * self.rate_ns)
             
             # Check if under limit
-            if len(self.requests[identifier]) >= self.max_requests:
+            if tokens < 1.0:
+                buckets[identifier] = (tokens, now)
                 return False
             
-            # Add new request
-            self.requests[identifier].append(now)
+            # Spend a token on this request
+            buckets[identifier] = (tokens - 1.0, now)
             return True
     
+    def _sweep(self, buckets: dict, now: int):
+        """Drop identifiers whose bucket has refilled completely.
+
+        A full bucket behaves exactly like an unseen identifier, so forgetting
+        it changes nothing; this keeps memory proportional to recently active
+        clients. Caller holds the shard's lock.
+        """
+        stale = [key for key, (tokens, last) in buckets.items()
+                 if tokens + (now - last) * self.rate_ns >= self.capacity]
+        for key in stale:
+            del buckets[key]
+    
     def reset(self, identifier: str):
         """Reset rate limit for an identifier"""
-        with self.lock:
-            if identifier in self.requests:
-                del self.requests[identifier]
+        shard = self.shards[hash(identifier) & (RATE_LIMIT_SHARDS - 1)]
+        with shard.lock:
+            shard.data.pop(identifier, None)
 
 
 # Global rate limiter instance
@@ -48,6 +100,11 @@ checkout_rate_limiter = RateLimiter(max_requests=5, window_seconds=60)
 def rate_limit(max_requests: int = 10, window_seconds: int = 60):
     """Decorator to apply rate limiting to routes"""
     limiter = RateLimiter(max_requests, window_seconds)
+    # Rejections are built from these; a bucket regains a token within
+    # window_seconds / max_requests, which is what clients are told to wait
+    retry_after = {"Retry-After": str(math.ceil(window_seconds / max_requests))}
+    limit_message = (f"Rate limit exceeded. You can only make {max_requests} requests per "
+                     f"{window_seconds} seconds. Please try again later.")
     
     def decorator(f):
         @wraps(f)
@@ -58,14 +115,13 @@ def rate_limit(max_requests: int = 10, window_seconds: int = 60):
             if not limiter.is_allowed(identifier):
                 # Check if this is an API request or web request
                 if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
-                    return jsonify({
-                        "error": "Rate limit exceeded. Please try again later."
-                    }), 429
+                    return Response(_RATE_LIMIT_JSON, 429, retry_after, mimetype="application/json")
                 else:
                     # For web requests, use flash message and redirect
-                    from flask import flash, redirect, url_for
-                    flash(f"Rate limit exceeded. You can only make {max_requests} requests per {window_seconds} seconds. Please try again later.", "error")
-                    return redirect(url_for('flash_sales.flash_products'))
+                    flash(limit_message, "error")
+                    response = redirect(url_for('flash_sales.flash_products'))
+                    response.headers.update(retry_after)
+                    return response
             
             return f(*args, **kwargs)
         return wrapped
@@ -1,13 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from ..dao import get_connection, SalesRepo
-from ..product_repo import AProductRepo
+from ..product_repo import AProductRepo, invalidate_product_cache
 from .flash_sale_manager import FlashSaleManager
 from .rate_limiter import rate_limit, checkout_rate_limiter
 from .cache import flash_sale_cache
 from .payment_resilience import process_payment_resilient
+import json
 import os
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List
 from functools import wraps
 
 # Create blueprint
@@ -22,11 +23,25 @@ flash_bp = Blueprint(
 root = Path(__file__).resolve().parents[2]
 db_path = os.environ.get("APP_DB_PATH", str(root / "app.sqlite"))
 
+# Flash cart rows for a JSON array of product ids (any cart size, one statement)
+_SQL_FLASH_CART_PRODUCTS = (
+    "SELECT id, name, price_cents, flash_price_cents, stock FROM product "
+    "WHERE id IN (SELECT value FROM json_each(?))"
+)
+
 
 def get_conn():
     return get_connection(db_path)
 
 
+def _get_flash_cart() -> List[List[int]]:
+    """Flash cart as [product_id, qty] pairs (older sessions hold a {str(pid): qty} dict)"""
+    flash_cart = session.get("flash_cart", [])
+    if isinstance(flash_cart, dict):
+        flash_cart = [[int(pid), qty] for pid, qty in flash_cart.items()]
+    return flash_cart
+
+
 def admin_required(f):
     """Decorator to restrict flash sales access to admin users only"""
     @wraps(f)
@@ -107,8 +122,13 @@ def flash_cart_add():
             return redirect(url_for("flash_sales.flash_products"))
         
         # Add to flash cart (separate from regular cart)
-        flash_cart = session.get("flash_cart", {})
-        flash_cart[str(pid)] = flash_cart.get(str(pid), 0) + qty
+        flash_cart = _get_flash_cart()
+        for item in flash_cart:
+            if item[0] == pid:
+                item[1] += qty
+                break
+        else:
+            flash_cart.append([pid, qty])
         session["flash_cart"] = flash_cart
         
         # Log event
@@ -124,7 +144,7 @@ def flash_cart_add():
 @admin_required
 def flash_cart_view():
     """View flash sale cart with discounted prices"""
-    flash_cart: Dict[str, int] = session.get("flash_cart", {})
+    flash_cart = _get_flash_cart()
     conn = get_conn()
     items = []
     total = 0
@@ -132,20 +152,22 @@ def flash_cart_view():
     try:
         manager = FlashSaleManager(conn)
         
-        for pid_str, qty in flash_cart.items():
-            pid = int(pid_str)
-            
-            # Get product and effective price
-            prod = conn.execute(
-                "SELECT id, name, price_cents, flash_price_cents, stock FROM product WHERE id = ?",
-                (pid,)
-            ).fetchone()
+        # All cart products in one query, bound as a single JSON array
+        pids = [pid for pid, _ in flash_cart]
+        products = {
+            row["id"]: row
+            for row in conn.execute(_SQL_FLASH_CART_PRODUCTS, (json.dumps(pids),))
+        }
+        active_ids = manager.get_active_flash_sales(products)
+        
+        for pid, qty in flash_cart:
+            prod = products.get(pid)
             
             if not prod:
                 continue
             
             # Use flash price if sale is active, otherwise regular price
-            if manager.is_flash_sale_active(pid):
+            if pid in active_ids:
                 unit = int(prod["flash_price_cents"])
                 regular_price = int(prod["price_cents"])
                 savings = (regular_price - unit) * qty
@@ -192,8 +214,7 @@ def flash_checkout():
     
     pay_method = request.form.get("payment_method", "CARD")
     user_id = session["user_id"]
-    flash_cart: Dict[str, int] = session.get("flash_cart", {})
-    cart_list = [(int(pid), qty) for pid, qty in flash_cart.items()]
+    cart_list = _get_flash_cart()
     
     if not cart_list:
         flash("Flash cart is empty", "error")
@@ -204,11 +225,12 @@ def flash_checkout():
         manager = FlashSaleManager(conn)
         product_repo = AProductRepo(conn)
         
-        # Validate all items still have active flash sales
-        for pid, _ in cart_list:
-            if not manager.is_flash_sale_active(pid):
-                flash(f"Flash sale ended for product {pid}", "error")
-                return redirect(url_for("flash_sales.flash_cart_view"))
+        # Validate all items still have active flash sales (one query for the cart)
+        active_ids = manager.get_active_flash_sales(pid for pid, _ in cart_list)
+        missing = [pid for pid, _ in cart_list if pid not in active_ids]
+        if missing:
+            flash(f"Flash sale ended for product {missing[0]}", "error")
+            return redirect(url_for("flash_sales.flash_cart_view"))
         
         # Create custom SalesRepo that uses flash prices
         repo = FlashSaleRepo(conn, product_repo, manager)
@@ -220,6 +242,7 @@ def flash_checkout():
             pay_method=pay_method,
             payment_cb=process_payment_resilient,
         )
+        invalidate_product_cache()
         
         # Clear flash cart on success
         session.pop("flash_cart", None)
@@ -239,9 +262,18 @@ class FlashSaleRepo(SalesRepo):
     def __init__(self, conn, product_repo, flash_manager: FlashSaleManager):
         super().__init__(conn, product_repo)
         self.flash_manager = flash_manager
+        # Products resolved during this checkout, keyed by product id
+        self._cache: Dict[int, Any] = {}
     
     def _get_active_product(self, product_id: int):
         """Override to return product with flash price if active"""
+        if product_id in self._cache:
+            return self._cache[product_id]
+        product = self._resolve_product(product_id)
+        self._cache[product_id] = product
+        return product
+
+    def _resolve_product(self, product_id: int):
         product = super()._get_active_product(product_id)
         if product and self.flash_manager.is_flash_sale_active(product_id):
             # Replace price with flash price
@@ -249,11 +281,6 @@ class FlashSaleRepo(SalesRepo):
             effective_price = self.flash_manager.get_effective_price(product_id)
             if effective_price:
                 product_dict["price_cents"] = effective_price
-            # Convert back to Row-like object
-            class FlashProduct:
-                def __init__(self, d):
-                    self.data = d
-                def __getitem__(self, key):
-                    return self.data[key]
-            return FlashProduct(product_dict)
+            # Callers only index by column name, which a dict supports as-is
+            return product_dict
         return product
\ No newline at end of file
@@ -20,17 +20,46 @@ def init_db(db_path: str = DEFAULT_DB_PATH) -> str:
 	Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 	conn = get_connection(db_path)
 	try:
+		# journal_mode is stored in the database file, so switching to WAL once
+		# here covers every later connection (pooled or not)
+		conn.execute("PRAGMA journal_mode = WAL")
 		if INIT_SQL.exists():
 			with open(INIT_SQL, "r", encoding="utf-8") as f:
 				sql = f.read()
 			if sql.strip():
 				conn.executescript(sql)
 				conn.commit()
+		_ensure_replacement_sale_column(conn)
 	finally:
 		conn.close()
 	return db_path
 
 
+def _ensure_replacement_sale_column(conn) -> None:
+	"""Add and index rma_activity_log.replacement_sale_id on existing RMA schemas.
+
+	The dashboard looks up replacement orders by this column instead of a
+	leading-wildcard LIKE on notes. Rows written before the column existed
+	are backfilled from the "Replacement order created: #<id>" note.
+	"""
+	cols = [r[1] for r in conn.execute("PRAGMA table_info(rma_activity_log)")]
+	if not cols:
+		return  # RMA migrations not applied yet
+	if "replacement_sale_id" not in cols:
+		conn.execute("ALTER TABLE rma_activity_log ADD COLUMN replacement_sale_id INTEGER")
+		conn.execute(
+			"""UPDATE rma_activity_log
+			   SET replacement_sale_id = CAST(substr(notes, instr(notes, '#') + 1) AS INTEGER)
+			   WHERE action = 'REPLACEMENT_PROCESSED'
+			     AND notes LIKE 'Replacement order created: #%'"""
+		)
+	conn.execute(
+		"CREATE INDEX IF NOT EXISTS idx_rma_activity_replacement_sale_id "
+		"ON rma_activity_log(replacement_sale_id)"
+	)
+	conn.commit()
+
+
 if __name__ == "__main__":
 	path = init_db()
 	print(f"Initialized SQLite DB at: {path}")
@@ -3,14 +3,57 @@ Monitoring dashboard and metrics API endpoints.
 Provides real-time visibility into system health and performance.
 """
 
-from flask import Blueprint, render_template, jsonify, request
-from src.observability.metrics_collector import metrics_collector
+from flask import Blueprint, Response, render_template, jsonify, make_response, request
+from src.observability.metrics_collector import metrics_collector, metrics_buffer
 from src.observability.structured_logger import app_logger
+from functools import wraps
+import os
 import time
 
+try:
+    from orjson import loads as json_loads
+except ImportError:  # optional; stdlib json also accepts bytes
+    from json import loads as json_loads
+
+# Seconds a health/metrics response is reused (and may be cached by proxies)
+RESPONSE_CACHE_TTL = 1
+
+# Bytes read from the end of logs/app.log when the in-memory ring is empty
+LOG_TAIL_BYTES = 64 * 1024
+
 monitoring_bp = Blueprint('monitoring', __name__, url_prefix='/monitoring')
 
 
+@monitoring_bp.before_request
+def flush_buffered_metrics():
+    """Apply middleware samples still sitting in the buffer before reading."""
+    metrics_buffer.flush()
+
+
+def _ttl_cache(seconds):
+    """Reuse a parameterless view's response for `seconds`.
+
+    Only the body, status and mimetype are kept so each hit still gets a
+    fresh Response object; Cache-Control lets a reverse proxy absorb polls.
+    """
+    def decorator(f):
+        cached = None  # (expires_at, body, status, mimetype)
+
+        @wraps(f)
+        def wrapped():
+            nonlocal cached
+            now = time.monotonic()
+            entry = cached
+            if entry is None or now >= entry[0]:
+                rv = make_response(f())
+                entry = cached = (now + seconds, rv.get_data(), rv.status_code, rv.mimetype)
+            response = Response(entry[1], status=entry[2], mimetype=entry[3])
+            response.headers['Cache-Control'] = f'max-age={seconds}'
+            return response
+        return wrapped
+    return decorator
+
+
 @monitoring_bp.route('/dashboard')
 def dashboard():
     """Render the monitoring dashboard UI."""
@@ -18,6 +61,7 @@ def dashboard():
 
 
 @monitoring_bp.route('/api/metrics')
+@_ttl_cache(RESPONSE_CACHE_TTL)
 def get_metrics():
     """
     API endpoint to fetch current metrics.
@@ -39,48 +83,56 @@ def get_metrics():
         }), 500
 
 
+def _counter(snapshot, name, labels=None):
+    return snapshot['counters'].get(metrics_collector._make_key(name, labels), 0)
+
+
 @monitoring_bp.route('/api/metrics/orders')
 def get_order_metrics():
     """Get detailed order metrics."""
+    snap = metrics_collector.snapshot()
+    rates = snap['rates']['orders_total']
     return jsonify({
-        'total_orders': metrics_collector.get_counter('orders_total'),
-        'successful_orders': metrics_collector.get_counter('orders_total', {'status': 'success'}),
-        'failed_orders': metrics_collector.get_counter('orders_total', {'status': 'failed'}),
-        'orders_per_minute': metrics_collector.get_rate('orders_total', window_seconds=60) * 60,
-        'orders_per_hour': metrics_collector.get_rate('orders_total', window_seconds=3600) * 3600
+        'total_orders': _counter(snap, 'orders_total'),
+        'successful_orders': _counter(snap, 'orders_total', {'status': 'success'}),
+        'failed_orders': _counter(snap, 'orders_total', {'status': 'failed'}),
+        'orders_per_minute': rates[60] * 60,
+        'orders_per_hour': rates[3600] * 3600
     })
 
 
 @monitoring_bp.route('/api/metrics/refunds')
 def get_refund_metrics():
     """Get detailed refund/returns metrics."""
+    snap = metrics_collector.snapshot()
     return jsonify({
-        'total_refunds': metrics_collector.get_counter('refunds_total'),
-        'approved_refunds': metrics_collector.get_counter('refunds_total', {'status': 'approved'}),
-        'rejected_refunds': metrics_collector.get_counter('refunds_total', {'status': 'rejected'}),
-        'pending_refunds': metrics_collector.get_counter('refunds_total', {'status': 'pending'}),
-        'refunds_per_day': metrics_collector.get_rate('refunds_total', window_seconds=86400) * 86400,
-        'avg_refund_amount_cents': metrics_collector.get_gauge('avg_refund_amount_cents')
+        'total_refunds': _counter(snap, 'refunds_total'),
+        'approved_refunds': _counter(snap, 'refunds_total', {'status': 'approved'}),
+        'rejected_refunds': _counter(snap, 'refunds_total', {'status': 'rejected'}),
+        'pending_refunds': _counter(snap, 'refunds_total', {'status': 'pending'}),
+        'refunds_per_day': snap['rates']['refunds_total'][86400] * 86400,
+        'avg_refund_amount_cents': snap['gauges'].get('avg_refund_amount_cents', 0.0)
     })
 
 
 @monitoring_bp.route('/api/metrics/errors')
 def get_error_metrics():
     """Get detailed error metrics."""
+    snap = metrics_collector.snapshot()
     return jsonify({
-        'total_errors': metrics_collector.get_counter('errors_total'),
-        'errors_per_minute': metrics_collector.get_rate('errors_total', window_seconds=60) * 60,
-        'client_errors_4xx': metrics_collector.get_counter('http_errors', {'type': '4xx'}),
-        'server_errors_5xx': metrics_collector.get_counter('http_errors', {'type': '5xx'}),
-        'rate_limit_errors': metrics_collector.get_counter('errors_total', {'type': 'rate_limit'}),
-        'payment_errors': metrics_collector.get_counter('errors_total', {'type': 'payment'})
+        'total_errors': _counter(snap, 'errors_total'),
+        'errors_per_minute': snap['rates']['errors_total'][60] * 60,
+        'client_errors_4xx': _counter(snap, 'http_errors', {'type': '4xx'}),
+        'server_errors_5xx': _counter(snap, 'http_errors', {'type': '5xx'}),
+        'rate_limit_errors': _counter(snap, 'errors_total', {'type': 'rate_limit'}),
+        'payment_errors': _counter(snap, 'errors_total', {'type': 'payment'})
     })
 
 
 @monitoring_bp.route('/api/metrics/performance')
 def get_performance_metrics():
     """Get detailed performance metrics."""
-    duration_stats = metrics_collector.get_histogram_stats('http_request_duration_seconds')
+    duration_stats = metrics_collector.snapshot()['histograms']['http_request_duration_seconds']
     
     return jsonify({
         'avg_response_time_ms': duration_stats.get('avg', 0) * 1000,
@@ -94,12 +146,13 @@ def get_performance_metrics():
 
 
 @monitoring_bp.route('/api/health')
+@_ttl_cache(RESPONSE_CACHE_TTL)
 def health_check():
     """
     Health check endpoint for container orchestration.
     Returns service health status.
     """
-    uptime = time.time() - metrics_collector.start_time
+    uptime = (time.monotonic_ns() - metrics_collector.start_time_ns) / 1e9
     
     # Check if error rate is too high
     error_rate = metrics_collector.get_rate('errors_total', window_seconds=60)
@@ -116,20 +169,33 @@ def health_check():
 @monitoring_bp.route('/api/logs/recent')
 def get_recent_logs():
     """
-    Get recent log entries (last 100 lines from log file).
+    Get recent log entries (last 100).
+    
+    Served from the logger's in-memory ring; the log file is only read
+    when this process has not logged anything yet.
     """
+    if app_logger.recent_ring:
+        logs = list(app_logger.recent_ring)[-100:]
+        return jsonify({
+            'status': 'success',
+            'logs': logs,
+            'count': len(logs)
+        })
     try:
-        with open('logs/app.log', 'r') as f:
-            lines = f.readlines()
-            recent_lines = lines[-100:]  # Last 100 lines
+        with open('logs/app.log', 'rb') as f:
+            # Only the tail is needed; read a bounded chunk from the end
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - LOG_TAIL_BYTES))
+            tail = f.read().splitlines()
+            if size > LOG_TAIL_BYTES:
+                tail = tail[1:]  # First line is likely cut mid-entry
+            recent_lines = tail[-100:]  # Last 100 lines
             
             logs = []
             for line in recent_lines:
                 try:
-                    import json
-                    log_entry = json.loads(line.strip())
-                    logs.append(log_entry)
-                except:
+                    logs.append(json_loads(line))
+                except ValueError:
                     # Skip malformed lines
                     pass
             
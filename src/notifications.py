@@ -3,10 +3,29 @@ Notification Service for RMA Status Changes
 Handles creation and retrieval of user notifications
 """
 
+import os
 import sqlite3
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from .flash_sales.cache import SimpleCache
+
+
+# Unread badge counts keyed by user; every write below invalidates the entry,
+# so the TTL only bounds staleness from changes made outside this service
+UNREAD_COUNT_TTL = int(os.environ.get('NOTIFICATION_COUNT_TTL', '60'))
+unread_count_cache = SimpleCache(default_ttl=UNREAD_COUNT_TTL)
+
+
+_SQL_INSERT_RMA_NOTIFICATION = """
+    INSERT INTO notifications (user_id, type, title, message, rma_id, rma_number)
+    VALUES (?, 'RMA_STATUS', ?, ?, ?, ?)
+"""
+
+
+def _unread_key(user_id: int) -> str:
+    return f"unread:{user_id}"
+
 
 class NotificationService:
     """Service for managing user notifications"""
@@ -27,6 +46,79 @@ class NotificationService:
         'CANCELLED': 'Cancelled'
     }
     
+    # (title, message) per status, then per disposition; the None entry covers
+    # any disposition without its own wording
+    MESSAGE_TEMPLATES = {
+        'SUBMITTED': {None: ("Return Request Submitted",
+                             "Your return request {rma_number} has been submitted and is awaiting review.")},
+        'APPROVED': {None: ("Return Request Approved",
+                            "Your return request {rma_number} has been approved. Please ship the item(s) back to us.")},
+        'REJECTED': {None: ("Return Request Not Approved",
+                            "Your return request {rma_number} could not be approved. Please check the details for more information.")},
+        'RECEIVED': {None: ("Return Received",
+                            "We've received your return {rma_number} and will inspect it shortly.")},
+        'INSPECTING': {None: ("Return Under Inspection",
+                              "Your return {rma_number} is currently being inspected by our team.")},
+        'INSPECTED': {None: ("Inspection Complete",
+                             "Inspection of your return {rma_number} is complete. We're processing the next steps.")},
+        # Disposition decision made - wording depends on the decision
+        'DISPOSITION': {
+            'REFUND': ("Refund Approved",
+                       "Your return {rma_number} has been approved for a refund. We're processing your refund now."),
+            'REPAIR': ("Repair Approved",
+                       "Your item {rma_number} will be repaired. We'll notify you once the repair is complete."),
+            'REPLACEMENT': ("Replacement Approved",
+                            "Your return {rma_number} has been approved for a replacement. We're preparing your replacement order."),
+            'STORE_CREDIT': ("Store Credit Approved",
+                             "Your return {rma_number} has been approved for store credit. The credit will be added to your account shortly."),
+            'REJECT': ("Return Decision: Not Approved",
+                       "After review, your return {rma_number} cannot be processed. The item will remain with you."),
+            None: ("Return Being Processed",
+                   "Your return {rma_number} is being processed. We'll update you soon."),
+        },
+        'PROCESSING': {
+            'REFUND': ("Refund Processing",
+                       "Your refund for {rma_number} is being processed. You'll receive it within 3-5 business days."),
+            'REPAIR': ("Item Under Repair",
+                       "Your item {rma_number} is currently being repaired by our technicians."),
+            'REPLACEMENT': ("Replacement Processing",
+                            "We're preparing your replacement order for {rma_number}."),
+            'STORE_CREDIT': ("Store Credit Processing",
+                             "We're adding store credit to your account for {rma_number}."),
+            None: ("Processing Your Return",
+                   "Your return {rma_number} is being processed."),
+        },
+        'COMPLETED': {
+            'REFUND': ("Refund Completed",
+                       "Your refund for {rma_number} has been completed. Thank you!"),
+            'REPAIR': ("Repair Completed",
+                       "Your item {rma_number} has been repaired and shipped back to you. Thank you!"),
+            'REPLACEMENT': ("Replacement Sent",
+                            "Your replacement for {rma_number} has been shipped. Thank you!"),
+            'STORE_CREDIT': ("Store Credit Issued",
+                             "Store credit for {rma_number} has been added to your account. Thank you!"),
+            'REJECT': ("Return Closed",
+                       "Your return request {rma_number} has been closed."),
+            None: ("Return Completed",
+                   "Your return {rma_number} has been completed. Thank you for your patience!"),
+        },
+        'CANCELLED': {None: ("Return Cancelled",
+                             "Your return request {rma_number} has been cancelled.")},
+    }
+    DEFAULT_TEMPLATE = ("Return Status Update",
+                        "Your return {rma_number} status has been updated to: {status_display}")
+    
+    @staticmethod
+    def _render_message(rma_number: str, new_status: str, disposition: Optional[str]):
+        """Return (title, message) for an RMA status change."""
+        templates = NotificationService.MESSAGE_TEMPLATES.get(new_status)
+        if templates is None:
+            title, message = NotificationService.DEFAULT_TEMPLATE
+        else:
+            title, message = templates.get(disposition) or templates[None]
+        status_display = NotificationService.STATUS_NAMES.get(new_status, new_status)
+        return title, message.format(rma_number=rma_number, status_display=status_display)
+    
     @staticmethod
     def create_rma_status_notification(
         conn: sqlite3.Connection,
@@ -52,100 +144,41 @@ class NotificationService:
         Returns:
             Notification ID
         """
-        status_display = NotificationService.STATUS_NAMES.get(new_status, new_status)
-        
-        # Generate appropriate message based on status and disposition
-        if new_status == 'SUBMITTED':
-            title = "Return Request Submitted"
-            message = f"Your return request {rma_number} has been submitted and is awaiting review."
-        elif new_status == 'APPROVED':
-            title = "Return Request Approved"
-            message = f"Your return request {rma_number} has been approved. Please ship the item(s) back to us."
-        elif new_status == 'REJECTED':
-            title = "Return Request Not Approved"
-            message = f"Your return request {rma_number} could not be approved. Please check the details for more information."
-        elif new_status == 'RECEIVED':
-            title = "Return Received"
-            message = f"We've received your return {rma_number} and will inspect it shortly."
-        elif new_status == 'INSPECTING':
-            title = "Return Under Inspection"
-            message = f"Your return {rma_number} is currently being inspected by our team."
-        elif new_status == 'INSPECTED':
-            title = "Inspection Complete"
-            message = f"Inspection of your return {rma_number} is complete. We're processing the next steps."
-        elif new_status == 'DISPOSITION':
-            # Disposition decision made - use specific message based on disposition
-            if disposition == 'REFUND':
-                title = "Refund Approved"
-                message = f"Your return {rma_number} has been approved for a refund. We're processing your refund now."
-            elif disposition == 'REPAIR':
-                title = "Repair Approved"
-                message = f"Your item {rma_number} will be repaired. We'll notify you once the repair is complete."
-            elif disposition == 'REPLACEMENT':
-                title = "Replacement Approved"
-                message = f"Your return {rma_number} has been approved for a replacement. We're preparing your replacement order."
-            elif disposition == 'STORE_CREDIT':
-                title = "Store Credit Approved"
-                message = f"Your return {rma_number} has been approved for store credit. The credit will be added to your account shortly."
-            elif disposition == 'REJECT':
-                title = "Return Decision: Not Approved"
-                message = f"After review, your return {rma_number} cannot be processed. The item will remain with you."
-            else:
-                title = "Return Being Processed"
-                message = f"Your return {rma_number} is being processed. We'll update you soon."
-        elif new_status == 'PROCESSING':
-            # Processing the disposition
-            if disposition == 'REFUND':
-                title = "Refund Processing"
-                message = f"Your refund for {rma_number} is being processed. You'll receive it within 3-5 business days."
-            elif disposition == 'REPAIR':
-                title = "Item Under Repair"
-                message = f"Your item {rma_number} is currently being repaired by our technicians."
-            elif disposition == 'REPLACEMENT':
-                title = "Replacement Processing"
-                message = f"We're preparing your replacement order for {rma_number}."
-            elif disposition == 'STORE_CREDIT':
-                title = "Store Credit Processing"
-                message = f"We're adding store credit to your account for {rma_number}."
-            else:
-                title = "Processing Your Return"
-                message = f"Your return {rma_number} is being processed."
-        elif new_status == 'COMPLETED':
-            # Completed - use disposition-specific message
-            if disposition == 'REFUND':
-                title = "Refund Completed"
-                message = f"Your refund for {rma_number} has been completed. Thank you!"
-            elif disposition == 'REPAIR':
-                title = "Repair Completed"
-                message = f"Your item {rma_number} has been repaired and shipped back to you. Thank you!"
-            elif disposition == 'REPLACEMENT':
-                title = "Replacement Sent"
-                message = f"Your replacement for {rma_number} has been shipped. Thank you!"
-            elif disposition == 'STORE_CREDIT':
-                title = "Store Credit Issued"
-                message = f"Store credit for {rma_number} has been added to your account. Thank you!"
-            elif disposition == 'REJECT':
-                title = "Return Closed"
-                message = f"Your return request {rma_number} has been closed."
-            else:
-                title = "Return Completed"
-                message = f"Your return {rma_number} has been completed. Thank you for your patience!"
-        elif new_status == 'CANCELLED':
-            title = "Return Cancelled"
-            message = f"Your return request {rma_number} has been cancelled."
-        else:
-            title = "Return Status Update"
-            message = f"Your return {rma_number} status has been updated to: {status_display}"
+        title, message = NotificationService._render_message(rma_number, new_status, disposition)
         
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO notifications (user_id, type, title, message, rma_id, rma_number)
-            VALUES (?, 'RMA_STATUS', ?, ?, ?, ?)
-        """, (user_id, title, message, rma_id, rma_number))
+        cursor.execute(_SQL_INSERT_RMA_NOTIFICATION, (user_id, title, message, rma_id, rma_number))
         conn.commit()
+        unread_count_cache.delete(_unread_key(user_id))
         
         return cursor.lastrowid
     
+    @staticmethod
+    def create_rma_status_notifications_bulk(conn: sqlite3.Connection, entries: List[tuple]) -> int:
+        """
+        Create several RMA status notifications in one transaction
+        
+        Args:
+            conn: Database connection
+            entries: (user_id, rma_id, rma_number, new_status, disposition) tuples
+            
+        Returns:
+            Number of notifications created
+        """
+        rows = []
+        for user_id, rma_id, rma_number, new_status, disposition in entries:
+            title, message = NotificationService._render_message(rma_number, new_status, disposition)
+            rows.append((user_id, title, message, rma_id, rma_number))
+        if not rows:
+            return 0
+        
+        conn.executemany(_SQL_INSERT_RMA_NOTIFICATION, rows)
+        conn.commit()
+        for user_id in {row[0] for row in rows}:
+            unread_count_cache.delete(_unread_key(user_id))
+        
+        return len(rows)
+    
     @staticmethod
     def get_user_notifications(
         conn: sqlite3.Connection,
@@ -181,35 +214,29 @@ class NotificationService:
         params.append(limit)
         
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         cursor.execute(query, params)
         
-        notifications = []
-        for row in cursor.fetchall():
-            notifications.append({
-                'id': row[0],
-                'type': row[1],
-                'title': row[2],
-                'message': row[3],
-                'rma_id': row[4],
-                'rma_number': row[5],
-                'is_read': bool(row[6]),
-                'read_at': row[7],
-                'created_at': row[8]
-            })
-        
-        return notifications
+        return [dict(row, is_read=bool(row['is_read'])) for row in cursor]
     
     @staticmethod
     def get_unread_count(conn: sqlite3.Connection, user_id: int) -> int:
-        """Get count of unread notifications for a user"""
+        """Get count of unread notifications for a user (cached per user)"""
+        key = _unread_key(user_id)
+        count = unread_count_cache.get(key)
+        if count is not None:
+            return count
+        
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT COUNT(*) FROM notifications
+            SELECT COUNT(1) FROM notifications
             WHERE user_id = ? AND is_read = 0
         """, (user_id,))
         
         result = cursor.fetchone()
-        return result[0] if result else 0
+        count = result[0] if result else 0
+        unread_count_cache.set(key, count)
+        return count
     
     @staticmethod
     def mark_as_read(conn: sqlite3.Connection, notification_id: int, user_id: int) -> bool:
@@ -231,6 +258,8 @@ class NotificationService:
             WHERE id = ? AND user_id = ? AND is_read = 0
         """, (notification_id, user_id))
         conn.commit()
+        if cursor.rowcount > 0:
+            unread_count_cache.delete(_unread_key(user_id))
         
         return cursor.rowcount > 0
     
@@ -249,6 +278,7 @@ class NotificationService:
             WHERE user_id = ? AND is_read = 0
         """, (user_id,))
         conn.commit()
+        unread_count_cache.set(_unread_key(user_id), 0)
         
         return cursor.rowcount
     
@@ -271,5 +301,6 @@ class NotificationService:
             WHERE id = ? AND user_id = ?
         """, (notification_id, user_id))
         conn.commit()
+        unread_count_cache.delete(_unread_key(user_id))
         
         return cursor.rowcount > 0
@@ -7,9 +7,33 @@ import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from collections import defaultdict, deque
-from threading import Lock
+from threading import Event, Lock, Thread, current_thread, local
 import json
 
+try:
+    import numpy as np
+except ImportError:  # optional; percentiles then come from a full sort
+    np = None
+
+
+# Rate windows (seconds) and histograms precomputed by MetricsCollector.snapshot()
+SNAPSHOT_RATES = {
+    'orders_total': (60, 3600),
+    'refunds_total': (86400,),
+    'errors_total': (60,),
+}
+SNAPSHOT_HISTOGRAMS = ('http_request_duration_seconds',)
+
+# Quantiles reported by get_histogram_stats as p50/p95/p99
+PERCENTILES = (0.50, 0.95, 0.99)
+
+# Distinct (name, labels) combinations remembered by MetricsCollector._make_key
+KEY_CACHE_SIZE = 4096
+
+# Per-second event buckets kept per rate series (one day, the longest window)
+RATE_BUCKETS = 86400
+NS_PER_SEC = 1_000_000_000
+
 
 class MetricsCollector:
     """
@@ -18,7 +42,13 @@ class MetricsCollector:
     """
     
     def __init__(self):
-        self.lock = Lock()
+        # One lock per store, so counter increments, gauge sets, histogram
+        # observations and rate events never wait on each other. No code holds
+        # two at once; readers spanning stores take them one after another.
+        self.counters_lock = Lock()
+        self.gauges_lock = Lock()
+        self.hist_lock = Lock()
+        self.tw_lock = Lock()
         
         # Counters (cumulative)
         self.counters = defaultdict(int)
@@ -26,48 +56,114 @@ class MetricsCollector:
         # Gauges (point-in-time values)
         self.gauges = defaultdict(float)
         
-        # Histograms (time-series data with retention)
-        self.histograms = defaultdict(lambda: deque(maxlen=1000))
+        # Histograms (time-series data with retention), kept as parallel
+        # value and timestamp deques rather than a dict per observation
+        self.hist_values = defaultdict(lambda: deque(maxlen=1000))
+        self.hist_timestamps = defaultdict(lambda: deque(maxlen=1000))
+        
+        # Time-windowed metrics (for rate calculations): [second, count]
+        # buckets, oldest first, only for seconds that saw events
+        self.time_windowed = defaultdict(lambda: deque(maxlen=RATE_BUCKETS))
         
-        # Time-windowed metrics (for rate calculations)
-        self.time_windowed = defaultdict(lambda: deque(maxlen=10000))
+        # (name, label items) -> formatted key; see _make_key
+        self._key_cache: Dict[tuple, str] = {}
+        
+        # Labelled counter keys read by get_business_metrics, formatted once
+        self._bm_keys = {
+            'orders_success': self._make_key('orders_total', {'status': 'success'}),
+            'orders_failed': self._make_key('orders_total', {'status': 'failed'}),
+            'refunds_approved': self._make_key('refunds_total', {'status': 'approved'}),
+            'refunds_rejected': self._make_key('refunds_total', {'status': 'rejected'}),
+            'refunds_pending': self._make_key('refunds_total', {'status': 'pending'}),
+            'errors_4xx': self._make_key('http_errors', {'type': '4xx'}),
+            'errors_5xx': self._make_key('http_errors', {'type': '5xx'}),
+        }
         
-        # Start time for uptime calculation
+        # Start time for uptime calculation; start_time is wall-clock for
+        # display, uptime is measured from start_time_ns
         self.start_time = time.time()
+        self.start_time_ns = time.monotonic_ns()
     
     def increment_counter(self, name: str, value: int = 1, labels: Optional[Dict] = None):
         """Increment a counter metric."""
-        with self.lock:
-            key = self._make_key(name, labels)
+        key = self._make_key(name, labels)
+        with self.counters_lock:
             self.counters[key] += value
     
+    def increment_many(self, counters: List[tuple]):
+        """Increment several counters by one under a single lock acquisition.
+
+        counters is a list of (name, labels) tuples; labels may be None.
+        """
+        keys = [self._make_key(name, labels) for name, labels in counters]
+        with self.counters_lock:
+            for key in keys:
+                self.counters[key] += 1
+    
     def set_gauge(self, name: str, value: float, labels: Optional[Dict] = None):
         """Set a gauge metric to a specific value."""
-        with self.lock:
-            key = self._make_key(name, labels)
+        key = self._make_key(name, labels)
+        with self.gauges_lock:
             self.gauges[key] = value
     
     def observe(self, name: str, value: float, labels: Optional[Dict] = None):
         """Record an observation for a histogram metric."""
-        with self.lock:
-            key = self._make_key(name, labels)
-            self.histograms[key].append({
-                'value': value,
-                'timestamp': time.time()
-            })
+        key = self._make_key(name, labels)
+        with self.hist_lock:
+            self.hist_values[key].append(value)
+            self.hist_timestamps[key].append(time.monotonic_ns())
     
     def record_event(self, name: str, labels: Optional[Dict] = None):
         """Record a timestamped event for rate calculations."""
-        with self.lock:
-            key = self._make_key(name, labels)
-            self.time_windowed[key].append(time.time())
+        key = self._make_key(name, labels)
+        with self.tw_lock:
+            self._count_event(key, time.monotonic_ns())
+    
+    def apply_batch(self, counters: Dict[str, int], observations: List, events: List):
+        """Apply pre-keyed updates, taking each store's lock once.
+
+        observations and events are lists of (key, value, timestamp) and
+        (key, timestamp) tuples respectively; timestamps are
+        time.monotonic_ns() values.
+        """
+        if counters:
+            with self.counters_lock:
+                for key, value in counters.items():
+                    self.counters[key] += value
+        if observations:
+            with self.hist_lock:
+                for key, value, ts in observations:
+                    self.hist_values[key].append(value)
+                    self.hist_timestamps[key].append(ts)
+        if events:
+            with self.tw_lock:
+                for key, ts in events:
+                    self._count_event(key, ts)
+    
+    def _count_event(self, key: str, ts: int):
+        """Add an event to its one-second bucket; caller holds tw_lock."""
+        second = ts // NS_PER_SEC
+        buckets = self.time_windowed[key]
+        if buckets and buckets[-1][0] >= second:
+            # Same second, or a slightly late event: count it in the newest bucket
+            buckets[-1][1] += 1
+        else:
+            buckets.append([second, 1])
     
     def _make_key(self, name: str, labels: Optional[Dict] = None) -> str:
-        """Create a unique key from metric name and labels."""
-        if labels:
+        """Create a unique key from metric name and labels (memoized per combination)."""
+        if not labels:
+            return name
+        cache_key = (name, tuple(labels.items()))
+        key = self._key_cache.get(cache_key)
+        if key is None:
             label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
-            return f"{name}{{{label_str}}}"
-        return name
+            key = f"{name}{{{label_str}}}"
+            if len(self._key_cache) >= KEY_CACHE_SIZE:
+                # Unbounded label values (ids, paths) would otherwise grow this forever
+                self._key_cache.clear()
+            self._key_cache[cache_key] = key
+        return key
     
     def get_counter(self, name: str, labels: Optional[Dict] = None) -> int:
         """Get current counter value."""
@@ -89,16 +185,14 @@ class MetricsCollector:
         # When labels are provided, look up the exact series
         if labels is not None:
             key = self._make_key(name, labels)
-            observations = self.histograms.get(key, deque())
-            values = sorted([obs['value'] for obs in observations])
+            values = list(self.hist_values.get(key, ()))
         else:
             # Aggregate across all series that match this histogram name
             values = []
             prefix = f"{name}{'{'}"
-            for k, dq in self.histograms.items():
+            for k, dq in self.hist_values.items():
                 if k == name or k.startswith(prefix):
-                    values.extend(obs['value'] for obs in dq)
-            values.sort()
+                    values.extend(dq)
         
         if not values:
             return {
@@ -113,59 +207,101 @@ class MetricsCollector:
             }
         
         count = len(values)
-        
-        # Clamp percentile index to valid range
-        def pct(values_list, p):
-            if not values_list:
-                return 0
-            idx = int(p * len(values_list))
-            if idx >= len(values_list):
-                idx = len(values_list) - 1
-            return values_list[idx]
+        if np is not None:
+            # numpy selects the quantiles without a full sort
+            arr = np.asarray(values, dtype=np.float64)
+            total = float(arr.sum())
+            p50, p95, p99 = (float(q) for q in np.quantile(arr, PERCENTILES, method='lower'))
+            low, high = float(arr.min()), float(arr.max())
+        else:
+            values.sort()
+            total = sum(values)
+            # Same 'lower' rule as numpy: the value at rank floor(p * (n - 1))
+            p50, p95, p99 = (values[int(p * (count - 1))] for p in PERCENTILES)
+            low, high = values[0], values[-1]
         
         return {
             'count': count,
-            'sum': sum(values),
-            'min': values[0],
-            'max': values[-1],
-            'avg': sum(values) / count,
-            'p50': pct(values, 0.50),
-            'p95': pct(values, 0.95),
-            'p99': pct(values, 0.99)
+            'sum': total,
+            'min': low,
+            'max': high,
+            'avg': total / count,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99
         }
     
     def get_rate(self, name: str, window_seconds: int = 60, labels: Optional[Dict] = None) -> float:
         """Calculate rate of events per second over a time window."""
-        key = self._make_key(name, labels)
-        events = self.time_windowed.get(key, deque())
+        return self._rate(self._make_key(name, labels), window_seconds, time.monotonic_ns())
+    
+    def _rate(self, key: str, window_seconds: int, now: int) -> float:
+        buckets = self.time_windowed.get(key)
         
-        if not events:
+        if not buckets:
             return 0.0
         
-        now = time.time()
-        cutoff = now - window_seconds
+        cutoff = now // NS_PER_SEC - window_seconds
         
-        # Count events within the window
-        recent_events = sum(1 for timestamp in events if timestamp >= cutoff)
+        # Sum the newest buckets until one falls outside the window
+        recent_events = 0
+        for second, count in reversed(buckets):
+            if second < cutoff:
+                break
+            recent_events += count
         
         return recent_events / window_seconds if window_seconds > 0 else 0.0
     
+    def snapshot(self) -> Dict:
+        """Read everything the dashboard endpoints need, one lock acquisition per store.
+        
+        Returns copies of the counters and gauges, rates for SNAPSHOT_RATES as
+        {name: {window: per_second}} and stats for SNAPSHOT_HISTOGRAMS.
+        """
+        with self.counters_lock:
+            counters = dict(self.counters)
+        with self.gauges_lock:
+            gauges = dict(self.gauges)
+        with self.hist_lock:
+            histograms = {name: self.get_histogram_stats(name) for name in SNAPSHOT_HISTOGRAMS}
+        with self.tw_lock:
+            now = time.monotonic_ns()
+            rates = {
+                name: {window: self._rate(name, window, now) for window in windows}
+                for name, windows in SNAPSHOT_RATES.items()
+            }
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'rates': rates,
+            'histograms': histograms,
+        }
+    
     def get_all_metrics(self) -> Dict:
         """Get all metrics in a structured format."""
-        with self.lock:
-            return {
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'uptime_seconds': time.time() - self.start_time,
-                'counters': dict(self.counters),
-                'gauges': dict(self.gauges),
-                'histograms': {
-                    name: self.get_histogram_stats(name)
-                    for name in self.histograms.keys()
-                }
+        with self.counters_lock:
+            counters = dict(self.counters)
+        with self.gauges_lock:
+            gauges = dict(self.gauges)
+        with self.hist_lock:
+            histograms = {
+                name: self.get_histogram_stats(name)
+                for name in self.hist_values.keys()
             }
+        return {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'uptime_seconds': (time.monotonic_ns() - self.start_time_ns) / NS_PER_SEC,
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms
+        }
     
     def get_business_metrics(self) -> Dict:
         """Get business-specific metrics for dashboard."""
+        counters = self.counters
+        keys = self._bm_keys
+        duration_stats = self.get_histogram_stats('http_request_duration_seconds')
+        
         # Load real data from database if available
         try:
             import sqlite3
@@ -220,17 +356,17 @@ class MetricsCollector:
                         'rate_per_day': self.get_rate('refunds_total', window_seconds=86400) * 86400
                     },
                     'errors': {
-                        'total': self.get_counter('errors_total'),
+                        'total': counters.get('errors_total', 0),
                         'rate_per_minute': self.get_rate('errors_total', window_seconds=60) * 60,
                         'by_type': {
-                            '4xx': self.get_counter('http_errors', {'type': '4xx'}),
-                            '5xx': self.get_counter('http_errors', {'type': '5xx'})
+                            '4xx': counters.get(keys['errors_4xx'], 0),
+                            '5xx': counters.get(keys['errors_5xx'], 0)
                         }
                     },
                     'performance': {
-                        'avg_response_time_ms': self.get_histogram_stats('http_request_duration_seconds').get('avg', 0) * 1000,
-                        'p95_response_time_ms': self.get_histogram_stats('http_request_duration_seconds').get('p95', 0) * 1000,
-                        'p99_response_time_ms': self.get_histogram_stats('http_request_duration_seconds').get('p99', 0) * 1000
+                        'avg_response_time_ms': duration_stats.get('avg', 0) * 1000,
+                        'p95_response_time_ms': duration_stats.get('p95', 0) * 1000,
+                        'p99_response_time_ms': duration_stats.get('p99', 0) * 1000
                     }
                 }
         except Exception as e:
@@ -239,37 +375,147 @@ class MetricsCollector:
         
         return {
             'orders': {
-                'total': self.get_counter('orders_total'),
-                'successful': self.get_counter('orders_total', {'status': 'success'}),
-                'failed': self.get_counter('orders_total', {'status': 'failed'}),
+                'total': counters.get('orders_total', 0),
+                'successful': counters.get(keys['orders_success'], 0),
+                'failed': counters.get(keys['orders_failed'], 0),
                 'rate_per_minute': self.get_rate('orders_total', window_seconds=60) * 60
             },
             'refunds': {
-                'total': self.get_counter('refunds_total'),
-                'approved': self.get_counter('refunds_total', {'status': 'approved'}),
-                'rejected': self.get_counter('refunds_total', {'status': 'rejected'}),
-                'pending': self.get_counter('refunds_total', {'status': 'pending'}),
+                'total': counters.get('refunds_total', 0),
+                'approved': counters.get(keys['refunds_approved'], 0),
+                'rejected': counters.get(keys['refunds_rejected'], 0),
+                'pending': counters.get(keys['refunds_pending'], 0),
                 'rate_per_day': self.get_rate('refunds_total', window_seconds=86400) * 86400
             },
             'errors': {
-                'total': self.get_counter('errors_total'),
+                'total': counters.get('errors_total', 0),
                 'rate_per_minute': self.get_rate('errors_total', window_seconds=60) * 60,
                 'by_type': {
-                    '4xx': self.get_counter('http_errors', {'type': '4xx'}),
-                    '5xx': self.get_counter('http_errors', {'type': '5xx'})
+                    '4xx': counters.get(keys['errors_4xx'], 0),
+                    '5xx': counters.get(keys['errors_5xx'], 0)
                 }
             },
             'performance': {
-                'avg_response_time_ms': self.get_histogram_stats('http_request_duration_seconds').get('avg', 0) * 1000,
-                'p95_response_time_ms': self.get_histogram_stats('http_request_duration_seconds').get('p95', 0) * 1000,
-                'p99_response_time_ms': self.get_histogram_stats('http_request_duration_seconds').get('p99', 0) * 1000
+                'avg_response_time_ms': duration_stats.get('avg', 0) * 1000,
+                'p95_response_time_ms': duration_stats.get('p95', 0) * 1000,
+                'p99_response_time_ms': duration_stats.get('p99', 0) * 1000
             }
         }
 
 
+class MetricsBuffer:
+    """
+    Lock-free front end for a MetricsCollector on the request hot path.
+    
+    Counters are pre-aggregated in a per-thread dict that only its owning
+    thread writes; the drain thread reads each thread's running totals and
+    merges the deltas since the last flush. Histogram observations and
+    events keep their raw values and timestamps, so they are appended as
+    tuples to a bounded deque (atomic in CPython); when it is full the
+    oldest pending samples are dropped. A daemon thread drains both every
+    flush_interval seconds and applies them to the collector under one lock.
+    """
+    
+    def __init__(self, collector: MetricsCollector, maxlen: int = 65536, flush_interval: float = 0.1):
+        self.collector = collector
+        self.pending = deque(maxlen=maxlen)
+        self.flush_interval = flush_interval
+        self._flush_lock = Lock()
+        self._thread: Optional[Thread] = None
+        self._stop = Event()
+        self._local = local()
+        # (owning thread, running totals, totals already flushed) per writer thread
+        self._thread_counts: List = []
+    
+    def _local_counts(self) -> Dict:
+        try:
+            return self._local.counts
+        except AttributeError:
+            counts = self._local.counts = {}
+            self._thread_counts.append((current_thread(), counts, {}))
+            return counts
+    
+    def increment_counter(self, name: str, value: int = 1, labels: Optional[Dict] = None):
+        counts = self._local_counts()
+        k = (name, tuple(labels.items()) if labels else None)
+        counts[k] = counts.get(k, 0) + value
+    
+    def observe(self, name: str, value: float, labels: Optional[Dict] = None):
+        self.pending.append(('h', name, value, tuple(labels.items()) if labels else None, time.monotonic_ns()))
+    
+    def record_event(self, name: str, labels: Optional[Dict] = None):
+        self.pending.append(('e', name, 1, tuple(labels.items()) if labels else None, time.monotonic_ns()))
+    
+    def flush(self):
+        """Drain pending samples into the collector."""
+        with self._flush_lock:
+            counters = defaultdict(int)
+            observations = []
+            events = []
+            keys = {}
+            
+            def make_key(name, labels):
+                key = keys.get((name, labels))
+                if key is None:
+                    key = keys[(name, labels)] = self.collector._make_key(name, dict(labels) if labels else None)
+                return key
+            
+            for entry in list(self._thread_counts):
+                thread, counts, flushed = entry
+                alive = thread.is_alive()
+                # dict.copy() runs without releasing the GIL, so the owner
+                # cannot change the dict mid-copy
+                for k, total in counts.copy().items():
+                    delta = total - flushed.get(k, 0)
+                    if delta:
+                        counters[make_key(*k)] += delta
+                        flushed[k] = total
+                if not alive:
+                    # The thread exited before the copy, so nothing is left unflushed
+                    self._thread_counts.remove(entry)
+            
+            popleft = self.pending.popleft
+            while True:
+                try:
+                    kind, name, value, labels, ts = popleft()
+                except IndexError:
+                    break
+                key = make_key(name, labels)
+                if kind == 'h':
+                    observations.append((key, value, ts))
+                else:
+                    events.append((key, ts))
+            if counters or observations or events:
+                self.collector.apply_batch(counters, observations, events)
+    
+    def start(self):
+        """Start the background drain thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='metrics-buffer', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self.flush()
+    
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+
 # Global metrics collector instance
 metrics_collector = MetricsCollector()
 
+# Buffered writer for request middleware; readers should flush() first
+metrics_buffer = MetricsBuffer(metrics_collector)
+
 
 def track_request_duration(endpoint: str):
     """Decorator to track request duration."""
@@ -278,7 +524,7 @@ def track_request_duration(endpoint: str):
         
         @wraps(f)
         def wrapped(*args, **kwargs):
-            start_time = time.time()
+            start_ns = time.monotonic_ns()
             
             try:
                 result = f(*args, **kwargs)
@@ -289,7 +535,7 @@ def track_request_duration(endpoint: str):
                 metrics_collector.increment_counter('errors_total')
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = (time.monotonic_ns() - start_ns) / NS_PER_SEC
                 metrics_collector.observe(
                     'http_request_duration_seconds',
                     duration,
@@ -0,0 +1,47 @@
+"""
+Sampled per-request profiling.
+Profiles 1 in N requests with pyinstrument (optional dependency) and keeps
+the most recent HTML reports in a fixed set of ring-buffer files.
+"""
+
+import itertools
+import os
+import zlib
+from typing import Optional
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores their reports."""
+    
+    def __init__(self, sample_every: int, out_dir: str, keep: int = 20):
+        self.sample_every = sample_every
+        self.out_dir = out_dir
+        self.keep = keep
+        self._slots = itertools.count()
+    
+    @property
+    def enabled(self) -> bool:
+        return Profiler is not None and self.sample_every > 0
+    
+    def start(self, request_id: str):
+        """Start a profiler if this request falls in the sample, else None."""
+        if not self.enabled or zlib.crc32(request_id.encode()) % self.sample_every:
+            return None
+        profiler = Profiler(async_mode='disabled')
+        profiler.start()
+        return profiler
+    
+    def finish(self, profiler) -> Optional[str]:
+        """Stop the profiler and write its HTML report; returns the file path."""
+        profiler.stop()
+        os.makedirs(self.out_dir, exist_ok=True)
+        slot = next(self._slots) % self.keep
+        path = os.path.join(self.out_dir, f"profile-{slot:02d}.html")
+        with open(path, 'w') as f:
+            f.write(profiler.output_html())
+        return path
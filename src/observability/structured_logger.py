@@ -3,13 +3,53 @@ Structured logging module for observability.
 Provides consistent log formatting with request IDs, timestamps, and severity levels.
 """
 
+import atexit
 import logging
 import json
-import uuid
+import os
+import queue
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from typing import Optional, Dict, Any
 from functools import wraps
-from flask import request, g
+from flask import request, g, has_request_context
+
+try:
+    import orjson
+except ImportError:  # optional; entries are then encoded with stdlib json
+    orjson = None
+
+
+def dumps_entry(entry: Dict[str, Any]) -> str:
+    """Encode a log entry as a JSON line (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(entry)
+
+
+# Most recent entries kept in memory for the monitoring dashboard
+RECENT_LOG_SIZE = 200
+
+
+def new_request_id() -> str:
+    """Random 128-bit request ID as 32 hex chars (cheaper than formatting a uuid4)."""
+    return os.urandom(16).hex()
+
+
+def get_request_id() -> str:
+    """Request ID for the current request, created on first use.
+
+    Honours an upstream X-Request-Id header; requests that never log or
+    profile never pay for generating one. Outside a request context a fresh
+    ID is returned each call.
+    """
+    if not has_request_context():
+        return new_request_id()
+    request_id = g.get('request_id')
+    if request_id is None:
+        request_id = g.request_id = request.headers.get('X-Request-Id') or new_request_id()
+    return request_id
 
 
 class StructuredLogger:
@@ -35,12 +75,38 @@ class StructuredLogger:
         file_handler = logging.FileHandler('logs/app.log')
         file_handler.setFormatter(JsonFormatter())
         self.logger.addHandler(file_handler)
+        
+        self._listener: Optional[QueueListener] = None
+        # Emitted entries, newest last; serves /monitoring/api/logs/recent
+        self.recent_ring: deque = deque(maxlen=RECENT_LOG_SIZE)
+    
+    def start_async(self, maxsize: int = 10000):
+        """
+        Move formatting and handler I/O onto a background thread.
+        
+        The request thread only enqueues the entry dict; a QueueListener
+        serializes it and writes to the original handlers. When the queue
+        is full new records are dropped rather than blocking the caller.
+        """
+        if self._listener is not None:
+            return
+        log_queue = queue.Queue(maxsize=maxsize)
+        self._listener = QueueListener(log_queue, *self.logger.handlers, respect_handler_level=True)
+        self.logger.handlers = [DroppingQueueHandler(log_queue)]
+        self._listener.start()
+        atexit.register(self.stop_async)
+    
+    def stop_async(self):
+        """Flush queued records and restore synchronous handlers."""
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        listener.stop()
+        self.logger.handlers = list(listener.handlers)
     
     def _get_request_id(self) -> str:
         """Get or create request ID for current request context."""
-        if hasattr(g, 'request_id'):
-            return g.request_id
-        return str(uuid.uuid4())
+        return get_request_id()
     
     def _build_log_entry(self, level: str, message: str, **kwargs) -> Dict[str, Any]:
         """Build structured log entry."""
@@ -69,34 +135,65 @@ class StructuredLogger:
         
         return log_entry
     
-    def info(self, message: str, **kwargs):
-        """Log info level message."""
-        self.logger.info(json.dumps(self._build_log_entry("INFO", message, **kwargs)))
+    def isEnabledFor(self, level: int) -> bool:
+        """True if a record at this level would be emitted; use to skip building context."""
+        return self.logger.isEnabledFor(level)
+    
+    def _log(self, level: int, level_name: str, message: str, args: tuple, kwargs: Dict[str, Any]):
+        # Check the level before formatting the message or serializing the entry
+        if not self.logger.isEnabledFor(level):
+            return
+        if args:
+            message = message % args
+        entry = self._build_log_entry(level_name, message, **kwargs)
+        self.recent_ring.append(entry)
+        # With a listener running the JSON encoding happens on its thread
+        self.logger.log(level, entry if self._listener is not None else dumps_entry(entry))
     
-    def warning(self, message: str, **kwargs):
+    def info(self, message: str, *args, **kwargs):
+        """Log info level message (%-style args are formatted only if emitted)."""
+        self._log(logging.INFO, "INFO", message, args, kwargs)
+    
+    def warning(self, message: str, *args, **kwargs):
         """Log warning level message."""
-        self.logger.warning(json.dumps(self._build_log_entry("WARNING", message, **kwargs)))
+        self._log(logging.WARNING, "WARNING", message, args, kwargs)
     
-    def error(self, message: str, **kwargs):
+    def error(self, message: str, *args, **kwargs):
         """Log error level message."""
-        self.logger.error(json.dumps(self._build_log_entry("ERROR", message, **kwargs)))
+        self._log(logging.ERROR, "ERROR", message, args, kwargs)
     
-    def debug(self, message: str, **kwargs):
+    def debug(self, message: str, *args, **kwargs):
         """Log debug level message."""
-        self.logger.debug(json.dumps(self._build_log_entry("DEBUG", message, **kwargs)))
+        self._log(logging.DEBUG, "DEBUG", message, args, kwargs)
     
-    def critical(self, message: str, **kwargs):
+    def critical(self, message: str, *args, **kwargs):
         """Log critical level message."""
-        self.logger.critical(json.dumps(self._build_log_entry("CRITICAL", message, **kwargs)))
+        self._log(logging.CRITICAL, "CRITICAL", message, args, kwargs)
 
 
 class JsonFormatter(logging.Formatter):
     """Custom formatter that outputs JSON."""
     
     def format(self, record):
+        if isinstance(record.msg, dict):
+            return dumps_entry(record.msg)
         return record.getMessage()
 
 
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks or reports errors when the queue is full."""
+    
+    def prepare(self, record):
+        # Leave formatting to the listener's handlers
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
 def log_request(logger: StructuredLogger):
     """
     Decorator to automatically log API requests and responses.
@@ -105,7 +202,7 @@ def log_request(logger: StructuredLogger):
         @wraps(f)
         def wrapped(*args, **kwargs):
             # Generate request ID
-            g.request_id = str(uuid.uuid4())
+            g.request_id = new_request_id()
             
             # Log incoming request
             logger.info(
@@ -143,4 +240,4 @@ def log_request(logger: StructuredLogger):
 
 
 # Create global logger instance
-app_logger = StructuredLogger("retail_app", log_level="INFO")
\ No newline at end of file
+app_logger = StructuredLogger("retail_app", log_level=os.environ.get("LOG_LEVEL", "INFO"))
\ No newline at end of file
@@ -15,6 +15,7 @@ import random
 from typing import Any, Dict, Optional, Tuple
 import sqlite3
 from .partner_ingest_service import upsert_products, validate_products
+from ..product_repo import invalidate_product_cache
 from .metrics import incr
 from .security import record_audit
 
@@ -147,6 +148,7 @@ def worker_loop(db_path: str, poll_interval: float = 0.1):
                         record_audit(partner_id, None, "worker_validation_failed", payload=json.dumps(validation_errors))
                     else:
                         upserted, upsert_errors = upsert_products(conn, valid_items, partner_id=partner_id)
+                        invalidate_product_cache()
                         logger.info("Ingest processed job=%s partner=%s upserted=%s errors=%s", jid, partner_id, upserted, upsert_errors)
                         diag = {"accepted": upserted, "rejected": len(upsert_errors), "errors": upsert_errors}
                         djson = json.dumps(diag)
@@ -258,6 +260,7 @@ def process_next_job_once(db_path: str) -> Optional[Dict[str, Any]]:
                     return {"job_id": jid, "status": "failed", "diagnostics": diag}
             else:
                 upserted, upsert_errors = upsert_products(conn, valid_items, partner_id=partner_id)
+                invalidate_product_cache()
                 cur = conn.cursor()
                 diag = {"accepted": upserted, "rejected": len(upsert_errors), "errors": upsert_errors}
                 djson = json.dumps(diag)
@@ -3,19 +3,57 @@
 This module provides a safer upsert that:
 - matches by SKU when provided
 - falls back to matching by name
-- uses a transaction for the entire batch and reports per-item errors
+- writes the entire batch in one transaction and reports per-item errors
 """
 from __future__ import annotations
 from typing import List, Dict, Tuple
 import sqlite3
 
+# Keys per IN (...) lookup; stays below SQLITE_MAX_VARIABLE_NUMBER on old builds
+LOOKUP_CHUNK = 500
+
+# SQLite's lower() folds ASCII letters only; name keys built in Python must
+# fold the same way or non-ASCII names never match their lower(trim(name))
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _name_key(name: str) -> str:
+    return name.translate(_ASCII_LOWER)
+
+
+def _normalize_price(p: Dict) -> int:
+    # Support either price_cents (int) or price (float) from adapters
+    if "price_cents" in p:
+        return int(p.get("price_cents", 0))
+    # convert dollars to cents
+    try:
+        return int(round(float(p.get("price", 0)) * 100))
+    except Exception:
+        return 0
+
+
+def _lookup_ids(cur: sqlite3.Cursor, column_sql: str, keys: List[str]) -> Dict[str, int]:
+    """Map keys to product ids with IN queries kept under SQLite's parameter limit."""
+    found: Dict[str, int] = {}
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        for prod_id, key in cur.execute(
+            f"SELECT id, {column_sql} FROM product WHERE {column_sql} IN ({placeholders})", chunk
+        ):
+            found.setdefault(key, prod_id)
+    return found
+
 
 def upsert_products(conn: sqlite3.Connection, products: List[Dict], partner_id: int | None = None, feed_hash: str | None = None) -> Tuple[int, List[str]]:
     """Upsert normalized product dicts into product table.
 
+    Existing products are resolved with bulk lookups and the whole batch is
+    written with executemany inside one BEGIN IMMEDIATE transaction. If that
+    fails the batch is rolled back and retried row by row.
+
     Returns (count_upserted, errors)
     """
-    upserted = 0
     errors: List[str] = []
     cur = conn.cursor()
     # Check idempotency: if partner_id and feed_hash provided and exists, skip
@@ -27,6 +65,86 @@ def upsert_products(conn: sqlite3.Connection, products: List[Dict], partner_id:
         except sqlite3.OperationalError:
             # table may not exist if schema not updated
             pass
+
+    rows = []
+    for idx, p in enumerate(products):
+        try:
+            sku = (p.get("sku") or "").strip()
+            name = (p.get("name") or "").strip()
+            rows.append((sku, name, _normalize_price(p), int(p.get("stock", 0))))
+        except Exception as e:
+            errors.append(f"Item {idx} error: {e}")
+
+    has_sku = any(col[1] == "sku" for col in cur.execute("PRAGMA table_info(product)"))
+    try:
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        by_sku = _lookup_ids(cur, "sku", list({r[0] for r in rows if r[0]})) if has_sku else {}
+        # Match names case- and whitespace-insensitively, like the row-by-row path
+        by_name = _lookup_ids(cur, "lower(trim(name))", list({_name_key(r[1]) for r in rows}))
+
+        updates: Dict[int, Tuple[int, int]] = {}
+        # Products new to the catalog, keyed by lowered name; later rows for the
+        # same product overwrite price/stock just as sequential upserts would
+        inserts: Dict[str, List] = {}
+        new_skus: Dict[str, str] = {}
+        for sku, name, price_cents, stock in rows:
+            key = _name_key(name)
+            prod_id = by_sku.get(sku) if sku else None
+            if not prod_id:
+                prod_id = by_name.get(key)
+            if prod_id:
+                updates[prod_id] = (price_cents, stock)
+                continue
+            key = new_skus.get(sku, key) if sku and has_sku else key
+            if key in inserts:
+                inserts[key][1:3] = [price_cents, stock]
+            else:
+                inserts[key] = [name, price_cents, stock, sku or None]
+                if sku:
+                    new_skus[sku] = key
+
+        if updates:
+            cur.executemany(
+                "UPDATE product SET price_cents = ?, stock = ?, active = 1 WHERE id = ?",
+                [(price_cents, stock, prod_id) for prod_id, (price_cents, stock) in updates.items()],
+            )
+        if inserts:
+            if has_sku:
+                cur.executemany(
+                    "INSERT INTO product (name, price_cents, stock, active, sku) VALUES (?, ?, ?, 1, ?)",
+                    [tuple(v) for v in inserts.values()],
+                )
+            else:
+                cur.executemany(
+                    "INSERT INTO product (name, price_cents, stock, active) VALUES (?, ?, ?, 1)",
+                    [tuple(v[:3]) for v in inserts.values()],
+                )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        return _upsert_products_each(conn, products, partner_id=partner_id, feed_hash=feed_hash)
+
+    upserted = len(rows)
+    # record partner_feed_imports if provided and at least one item upserted
+    if partner_id and feed_hash and upserted > 0:
+        try:
+            cur.execute("INSERT INTO partner_feed_imports (partner_id, feed_hash) VALUES (?, ?)", (partner_id, feed_hash))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            # duplicate entry - ignore
+            pass
+
+    return upserted, errors
+
+
+def _upsert_products_each(conn: sqlite3.Connection, products: List[Dict], partner_id: int | None = None, feed_hash: str | None = None) -> Tuple[int, List[str]]:
+    """Row-by-row upsert used when the batched path hits a database error,
+    so the caller still gets per-item error messages.
+    """
+    upserted = 0
+    errors: List[str] = []
+    cur = conn.cursor()
     try:
         for idx, p in enumerate(products):
             try:
@@ -118,9 +236,12 @@ def upsert_products(conn: sqlite3.Connection, products: List[Dict], partner_id:
     return upserted, errors
 
 
-def validate_products(products: List[Dict], strict: bool = False) -> Tuple[List[Dict], List[str]]:
+def validate_products(products: List[Dict], strict: bool = False, start: int = 0) -> Tuple[List[Dict], List[str]]:
     """Validate normalized product dicts. Returns (valid_items, errors).
 
+    `start` offsets the item numbers in error messages when a feed is
+    validated in batches.
+
     Simple rules:
     - name required and non-empty
     - price_cents must be int >= 0
@@ -129,7 +250,7 @@ def validate_products(products: List[Dict], strict: bool = False) -> Tuple[List[
     """
     valid: List[Dict] = []
     errors: List[str] = []
-    for idx, p in enumerate(products):
+    for idx, p in enumerate(products, start):
         try:
             name = (p.get("name") or "").strip()
             if not name:
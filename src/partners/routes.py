@@ -6,12 +6,12 @@ import json
 from .partner_adapters import parse_feed
 from .integrability import get_contract, validate_against_contract
 from .partner_ingest_service import upsert_products
+from ..product_repo import invalidate_product_cache
 from .ingest_queue import enqueue_feed, start_worker
 from .metrics import get_metrics
 from .security import check_rate_limit, record_audit, mask_key, hash_key_for_storage
 from .security import try_acquire_inflight, release_inflight
 import sqlite3, os
-from prometheus_client import REGISTRY
 import math
 from functools import wraps
 
@@ -145,6 +145,8 @@ def partner_admin_metrics():
     contract_validate = 0
 
     try:
+        # Imported here so app start-up doesn't load prometheus_client for one admin page
+        from prometheus_client import REGISTRY
         for mf in REGISTRY.collect():
             name = mf.name
             for sample in mf.samples:
@@ -427,6 +429,7 @@ def partner_ingest():
             record_audit(partner_id, api_key, "ingest_sync_validation_failed", payload=str(feed_hash))
             return (jsonify(summary), 422)
         upserted, upsert_errors = upsert_products(conn, valid_items, partner_id=partner_id, feed_hash=feed_hash)
+        invalidate_product_cache()
         # Prepare sync response summarizing upsert results
         summary = {"status": "ok", "accepted": upserted, "rejected": len(upsert_errors) if upsert_errors else 0, "errors": upsert_errors}
         record_audit(partner_id, api_key, "ingest_sync_upsert", payload=str(summary))
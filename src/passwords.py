@@ -0,0 +1,77 @@
+"""Password hashing helpers.
+
+New hashes use argon2id when argon2-cffi is installed and fall back to
+werkzeug's pbkdf2:sha256 otherwise. Verification accepts both formats, and
+needs_rehash() tells login when a stored hash should be upgraded.
+"""
+from __future__ import annotations
+
+import os
+from time import perf_counter, sleep
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError
+    _argon2 = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+except ImportError:
+    _argon2 = None
+
+ARGON2_PREFIX = "$argon2"
+
+# PBKDF2 rounds for the fallback hasher; unset keeps werkzeug's default.
+# Lower it only for seed scripts and tests, never for real accounts.
+PBKDF2_ITERATIONS = int(os.environ.get("PBKDF2_ITER", "0")) or None
+
+# Seconds one verify_password() call takes, measured on first use
+_verify_seconds = None
+
+
+def hash_password(password: str) -> str:
+    if _argon2 is not None:
+        return _argon2.hash(password)
+    if PBKDF2_ITERATIONS:
+        return generate_password_hash(password, method=f"pbkdf2:sha256:{PBKDF2_ITERATIONS}")
+    return generate_password_hash(password, method="pbkdf2:sha256")
+
+
+def verify_password(stored: str, password: str) -> bool:
+    """Check a password against a stored hash.
+
+    Raises ValueError for hash formats this install cannot verify.
+    """
+    if stored.startswith(ARGON2_PREFIX):
+        if _argon2 is None:
+            raise ValueError("argon2 hash found but argon2-cffi is not installed")
+        try:
+            return _argon2.verify(stored, password)
+        except VerificationError:
+            return False
+    return check_password_hash(stored, password)
+
+
+def needs_rehash(stored: str) -> bool:
+    """True when a verified hash should be replaced with hash_password()."""
+    if _argon2 is None:
+        return False
+    if not stored.startswith(ARGON2_PREFIX):
+        return True
+    return _argon2.check_needs_rehash(stored)
+
+
+def unknown_user_delay() -> None:
+    """Wait about as long as a real verify_password() without doing the work.
+
+    Called for logins with an unknown username so response time doesn't
+    reveal which usernames exist. The hash cost is measured once against a
+    throwaway hash; afterwards each call only sleeps, so floods of bogus
+    usernames don't burn a KDF run each.
+    """
+    global _verify_seconds
+    if _verify_seconds is None:
+        dummy = hash_password("unknown-user")
+        start = perf_counter()
+        verify_password(dummy, "not-the-password")
+        _verify_seconds = perf_counter() - start
+    sleep(_verify_seconds)
@@ -1,44 +1,111 @@
-from .dao import ProductRepo
+import json
+import weakref
+
+from .dao import ProductRepo, fetch_dicts
+
+
+# Single-row lookups used on every cart/checkout request; one SQL string each
+# so the pooled connection's statement cache always hits
+_SQL_PRODUCT_BY_ID = (
+    "SELECT id, name, price_cents, stock, active, flash_sale_active, flash_sale_price_cents "
+    "FROM product WHERE id = ? AND active = 1"
+)
+_SQL_STOCK_BY_ID = "SELECT stock FROM product WHERE id = ? AND active = 1"
+# Bulk lookup binding the id list as one JSON array: the SQL text is the same
+# for any cart size and never approaches SQLite's bound-parameter limit
+_SQL_PRODUCTS_BY_IDS = (
+    "SELECT id, name, price_cents, stock, active, flash_sale_active, flash_sale_price_cents "
+    "FROM product WHERE id IN (SELECT value FROM json_each(?)) AND active = 1"
+)
+
+
+# Caches handed to AProductRepo by each app; writers outside the app factory
+# (partner ingest, flash checkout) clear them through invalidate_product_cache()
+_product_caches = weakref.WeakSet()
+
+
+def register_product_cache(cache):
+    """Have invalidate_product_cache() clear this cache on product writes."""
+    _product_caches.add(cache)
+
+
+def invalidate_product_cache():
+    """Drop cached catalog reads after a write to product price or stock."""
+    for cache in list(_product_caches):
+        cache.clear()
+
+
+def _apply_flash_price(product):
+    """Swap in the flash sale price when one is active (mutates and returns product)."""
+    if product['flash_sale_active'] == 1 and product['flash_sale_price_cents']:
+        product['original_price'] = product['price_cents']
+        product['price_cents'] = product['flash_sale_price_cents']
+        product['is_flash_sale'] = True
+    else:
+        product['is_flash_sale'] = False
+    return product
+
 
 class AProductRepo(ProductRepo):
-    """Partner A's implementation of the ProductRepo interface"""
+    """Partner A's implementation of the ProductRepo interface
+
+    An optional cache (anything with get/set, e.g. SimpleCache) serves
+    repeated catalog reads; register it with register_product_cache() and
+    call invalidate_product_cache() after products change.
+    """
     
-    def __init__(self, conn):
+    def __init__(self, conn, cache=None):
         self.conn = conn
+        self.cache = cache
     
     def get_product(self, product_id: int):
         """Get an active product by ID with flash sale price if applicable"""
-        cursor = self.conn.execute(
-            """SELECT id, name, price_cents, stock, active, 
-                      flash_sale_active, flash_sale_price_cents 
-               FROM product 
-               WHERE id = ? AND active = 1""",
-            (product_id,)
-        )
+        if self.cache is not None:
+            cached = self.cache.get(f"product:{product_id}")
+            if cached is not None:
+                return dict(cached)
+        cursor = self.conn.execute(_SQL_PRODUCT_BY_ID, (product_id,))
         row = cursor.fetchone()
         
         if not row:
             return None
         
         # Convert to dict so we can modify it
-        product = dict(row)
-        
-        # Check if flash sale is active and apply flash price
-        if product['flash_sale_active'] == 1 and product['flash_sale_price_cents']:
-            product['original_price'] = product['price_cents']
-            product['price_cents'] = product['flash_sale_price_cents']
-            product['is_flash_sale'] = True
-        else:
-            product['is_flash_sale'] = False
-        
+        product = _apply_flash_price(dict(row))
+        if self.cache is not None:
+            self.cache.set(f"product:{product_id}", product)
+            return dict(product)
         return product
 
+    def get_products_bulk(self, product_ids):
+        """Get several active products in one query.
+
+        Returns:
+            Dict[int, Dict] keyed by product id, with flash sale prices
+            applied. Unknown or inactive IDs are omitted.
+        """
+        ids = list(dict.fromkeys(product_ids))
+        found = {}
+        if self.cache is not None:
+            for pid in ids:
+                cached = self.cache.get(f"product:{pid}")
+                if cached is not None:
+                    found[pid] = dict(cached)
+            ids = [pid for pid in ids if pid not in found]
+        if not ids:
+            return found
+        rows = fetch_dicts(self.conn, _SQL_PRODUCTS_BY_IDS, (json.dumps(ids),))
+        for row in rows:
+            product = _apply_flash_price(row)
+            if self.cache is not None:
+                self.cache.set(f"product:{product['id']}", product)
+                product = dict(product)
+            found[product['id']] = product
+        return found
+
     def check_stock(self, product_id: int, qty: int) -> bool:
         """Check if product has sufficient stock and is active"""
-        cursor = self.conn.execute(
-            "SELECT stock FROM product WHERE id = ? AND active = 1",
-            (product_id,)
-        )
+        cursor = self.conn.execute(_SQL_STOCK_BY_ID, (product_id,))
         result = cursor.fetchone()
         if result is None:
             return False
@@ -54,59 +121,38 @@ class AProductRepo(ProductRepo):
     
     def search_products(self, query: str = ""):
         """Search products by name with flash sale prices"""
-        if query:
-            cursor = self.conn.execute(
-                """SELECT id, name, price_cents, stock,
-                          flash_sale_active, flash_sale_price_cents
-                   FROM product 
-                   WHERE active = 1 AND name LIKE ? 
-                   ORDER BY name""",
-                (f"%{query}%",)
-            )
-        else:
+        if not query:
             return self.get_all_products()
-        
-        rows = cursor.fetchall()
-        products = []
-        for row in rows:
-            product = dict(row)
-            
-            if product['flash_sale_active'] == 1 and product['flash_sale_price_cents']:
-                product['original_price'] = product['price_cents']
-                product['price_cents'] = product['flash_sale_price_cents']
-                product['is_flash_sale'] = True
-            else:
-                product['is_flash_sale'] = False
-            
-            products.append(product)
-        
-        return products
+        rows = fetch_dicts(
+            self.conn,
+            """SELECT id, name, price_cents, stock,
+                      flash_sale_active, flash_sale_price_cents
+               FROM product 
+               WHERE active = 1 AND name LIKE ? 
+               ORDER BY name""",
+            (f"%{query}%",)
+        )
+        return [_apply_flash_price(row) for row in rows]
         
     def get_all_products(self):
         """Get all active products with flash sale prices"""
-        cursor = self.conn.execute(
+        if self.cache is not None:
+            cached = self.cache.get("products:all")
+            if cached is not None:
+                return [dict(p) for p in cached]
+        rows = fetch_dicts(
+            self.conn,
             """SELECT id, name, price_cents, stock, 
                       flash_sale_active, flash_sale_price_cents 
                FROM product 
                WHERE active = 1 
                ORDER BY name"""
         )
-        rows = cursor.fetchall()
-        
-        products = []
-        for row in rows:
-            product = dict(row)
-            
-            # Apply flash sale price if active
-            if product['flash_sale_active'] == 1 and product['flash_sale_price_cents']:
-                product['original_price'] = product['price_cents']
-                product['price_cents'] = product['flash_sale_price_cents']
-                product['is_flash_sale'] = True
-            else:
-                product['is_flash_sale'] = False
-            
-            products.append(product)
+        products = [_apply_flash_price(row) for row in rows]
         
+        if self.cache is not None:
+            self.cache.set("products:all", products)
+            return [dict(p) for p in products]
         return products
 
     def get_low_stock_products(self, threshold: int):
@@ -117,12 +163,19 @@ class AProductRepo(ProductRepo):
         Returns:
             List[Dict] of {id, name, stock}
         """
-        cursor = self.conn.execute(
+        if self.cache is not None:
+            cached = self.cache.get(f"low_stock:{threshold}")
+            if cached is not None:
+                return [dict(row) for row in cached]
+        rows = fetch_dicts(
+            self.conn,
             """SELECT id, name, stock
                    FROM product
                    WHERE active = 1 AND stock <= ?
                    ORDER BY stock ASC, name""",
             (threshold,)
         )
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
\ No newline at end of file
+        if self.cache is not None:
+            self.cache.set(f"low_stock:{threshold}", rows)
+            return [dict(row) for row in rows]
+        return rows
\ No newline at end of file
@@ -17,6 +17,7 @@ import json
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Tuple, Any
 from src.notifications import NotificationService
+from src.product_repo import invalidate_product_cache
 
 
 class RMAManager:
@@ -462,6 +463,7 @@ class RMAManager:
                               f"Refund failed: {error_message}")
         
         self.conn.commit()
+        invalidate_product_cache()
     
     # =============================
     # STEP 7: Closure & Reporting
@@ -541,7 +543,8 @@ class RMAManager:
         """, (rma_id,))
         
         self._log_activity(rma_id, "REPLACEMENT_PROCESSED", "DISPOSITION", "COMPLETED", actor,
-                          f"Replacement order created: #{replacement_sale_id}. Inventory decreased for replacement items.")
+                          f"Replacement order created: #{replacement_sale_id}. Inventory decreased for replacement items.",
+                          replacement_sale_id=replacement_sale_id)
         
         # Notify customer
         self._notify_customer(
@@ -551,6 +554,7 @@ class RMAManager:
         )
         
         self.conn.commit()
+        invalidate_product_cache()
         return replacement_sale_id
     
     def process_store_credit(
@@ -593,6 +597,7 @@ class RMAManager:
         )
         
         self.conn.commit()
+        invalidate_product_cache()
     
     def process_repair(
         self,
@@ -896,14 +901,23 @@ class RMAManager:
         new_status: str,
         actor: str,
         notes: str = "",
-        metadata: Dict = None
+        metadata: Dict = None,
+        replacement_sale_id: Optional[int] = None
     ):
         """Log activity to audit trail and create notifications for status changes."""
         # Log activity
-        self.conn.execute("""
-            INSERT INTO rma_activity_log (rma_id, action, old_status, new_status, actor, notes, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (rma_id, action, old_status, new_status, actor, notes, json.dumps(metadata or {})))
+        if replacement_sale_id is None:
+            self.conn.execute("""
+                INSERT INTO rma_activity_log (rma_id, action, old_status, new_status, actor, notes, metadata)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (rma_id, action, old_status, new_status, actor, notes, json.dumps(metadata or {})))
+        else:
+            self.conn.execute("""
+                INSERT INTO rma_activity_log (rma_id, action, old_status, new_status, actor, notes, metadata,
+                                              replacement_sale_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (rma_id, action, old_status, new_status, actor, notes, json.dumps(metadata or {}),
+                  replacement_sale_id))
         
         # Create notification for significant status changes
         # Get RMA details including disposition for notification
@@ -5,19 +5,19 @@ This allows users to have separate sessions in different browser tabs,
 enabling simultaneous customer and admin logins.
 """
 
-import json
-import os
 import pickle
-import sqlite3
+import secrets
 from datetime import datetime, timedelta
 from flask.sessions import SessionInterface, SessionMixin
 from werkzeug.datastructures import CallbackDict
 
+from .dao import get_pool
+
 
 class DatabaseSession(CallbackDict, SessionMixin):
     """A session object backed by the database."""
 
-    def __init__(self, initial=None, sid=None, permanent=False):
+    def __init__(self, initial=None, sid=None, permanent=False, stored_data=None):
         def on_update(self):
             self.modified = True
 
@@ -25,13 +25,20 @@ class DatabaseSession(CallbackDict, SessionMixin):
         self.sid = sid
         self.permanent = permanent
         self.modified = False
+        # Pickled bytes as loaded from the database, to detect no-op writes
+        self.stored_data = stored_data
 
 
 class DatabaseSessionInterface(SessionInterface):
-    """Flask session interface that stores sessions in SQLite database."""
+    """Flask session interface that stores sessions in SQLite database.
+
+    Only an opaque session ID travels in the cookie; session data stays
+    server-side and is read/written over the shared connection pool.
+    """
 
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
 
     def open_session(self, app, request):
         """Load session from database."""
@@ -41,22 +48,20 @@ class DatabaseSessionInterface(SessionInterface):
             return DatabaseSession(sid=None, permanent=False)
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            
-            # Get session data from database
-            cur.execute(
-                "SELECT data, expires_at FROM flask_sessions WHERE id = ? AND expires_at > datetime('now')",
-                (sid,)
-            )
-            row = cur.fetchone()
-            conn.close()
+            conn = self.pool.acquire()
+            try:
+                # Get session data from database
+                row = conn.execute(
+                    "SELECT data, expires_at FROM flask_sessions WHERE id = ? AND expires_at > datetime('now')",
+                    (sid,)
+                ).fetchone()
+            finally:
+                self.pool.release(conn)
             
             if row:
                 try:
                     data = pickle.loads(row['data'])
-                    return DatabaseSession(initial=data, sid=sid, permanent=True)
+                    return DatabaseSession(initial=data, sid=sid, permanent=True, stored_data=row['data'])
                 except Exception as e:
                     # Corrupted session data
                     app.logger.error(f"Failed to deserialize session data: {e}")
@@ -77,10 +82,12 @@ class DatabaseSessionInterface(SessionInterface):
         if not session:
             if session.sid:
                 try:
-                    conn = sqlite3.connect(self.db_path)
-                    conn.execute("DELETE FROM flask_sessions WHERE id = ?", (session.sid,))
-                    conn.commit()
-                    conn.close()
+                    conn = self.pool.acquire()
+                    try:
+                        conn.execute("DELETE FROM flask_sessions WHERE id = ?", (session.sid,))
+                        conn.commit()
+                    finally:
+                        self.pool.release(conn)
                 except Exception as e:
                     app.logger.error(f"Failed to delete session: {e}")
             
@@ -98,7 +105,6 @@ class DatabaseSessionInterface(SessionInterface):
 
         # Generate session ID if needed
         if not session.sid:
-            import secrets
             session.sid = secrets.token_urlsafe(32)
 
         # Calculate expiration
@@ -109,18 +115,28 @@ class DatabaseSessionInterface(SessionInterface):
 
         # Save to database
         try:
-            conn = sqlite3.connect(self.db_path)
             data = pickle.dumps(dict(session))
-            
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO flask_sessions (id, data, updated_at, expires_at)
-                VALUES (?, ?, datetime('now'), ?)
-                """,
-                (session.sid, data, expires.isoformat())
-            )
-            conn.commit()
-            conn.close()
+        except Exception as e:
+            app.logger.error(f"Failed to save session: {e}")
+            return
+        # Assignments that leave the contents unchanged (e.g. re-saving the
+        # same cart) mark the session modified; skip the write and Set-Cookie
+        if session.sid and session.stored_data is not None and data == session.stored_data:
+            return
+
+        try:
+            conn = self.pool.acquire()
+            try:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO flask_sessions (id, data, updated_at, expires_at)
+                    VALUES (?, ?, datetime('now'), ?)
+                    """,
+                    (session.sid, data, expires.isoformat())
+                )
+                conn.commit()
+            finally:
+                self.pool.release(conn)
         except Exception as e:
             app.logger.error(f"Failed to save session: {e}")
             return
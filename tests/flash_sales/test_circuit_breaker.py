@@ -103,4 +103,18 @@ def test_circuit_breaker_reset():
     
     assert breaker.get_state() == CircuitState.CLOSED
     result = breaker.call(succeeding_function)
-    assert result == "success"
\ No newline at end of file
+    assert result == "success"
+
+def test_circuit_breaker_closed_success_skips_lock():
+    """Test successful calls on a healthy circuit never take the lock"""
+    class NoLock:
+        def __enter__(self):
+            raise AssertionError("lock taken on the fast path")
+        def __exit__(self, *exc):
+            return False
+
+    breaker = CircuitBreaker(failure_threshold=3, timeout_seconds=60)
+    breaker.lock = NoLock()
+    
+    assert breaker.call(succeeding_function) == "success"
+    assert breaker.call(succeeding_function) == "success"
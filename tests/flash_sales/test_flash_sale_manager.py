@@ -163,4 +163,53 @@ def test_log_event(db_conn):
     
     assert log is not None
     assert log['event_type'] == "SALE_START"
-    assert log['details'] == "Flash sale started"
\ No newline at end of file
+    assert log['details'] == "Flash sale started"
+
+def test_flash_sale_repo_resolves_each_product_once(db_conn):
+    """A checkout looks up each product's flash price only once"""
+    from src.dao import ProductRepo
+    from src.flash_sales.routes import FlashSaleRepo
+
+    now = datetime.now()
+    db_conn.execute("""
+        INSERT INTO product (id, name, price_cents, flash_price_cents, stock, sale_start, sale_end, active)
+        VALUES (1, 'Flash Item', 10000, 7500, 10, ?, ?, 1)
+    """, ((now - timedelta(hours=1)).isoformat(), (now + timedelta(hours=1)).isoformat()))
+    db_conn.commit()
+
+    class CountingManager(FlashSaleManager):
+        calls = 0
+
+        def is_flash_sale_active(self, product_id):
+            CountingManager.calls += 1
+            return super().is_flash_sale_active(product_id)
+
+    repo = FlashSaleRepo(db_conn, ProductRepo(), CountingManager(db_conn))
+    first = repo._get_active_product(1)
+    calls = CountingManager.calls
+    assert first["price_cents"] == 7500
+    assert repo._get_active_product(1) is first
+    assert CountingManager.calls == calls
+
+
+def test_get_active_flash_sales(db_conn):
+    """Batch lookup returns only products inside their sale window"""
+    now = datetime.now()
+    past, future = (now - timedelta(hours=1)).isoformat(), (now + timedelta(hours=1)).isoformat()
+    db_conn.executemany("""
+        INSERT INTO product (id, name, price_cents, flash_price_cents, stock, sale_start, sale_end, active)
+        VALUES (?, ?, 10000, ?, 10, ?, ?, ?)
+    """, [
+        (1, "Active", 7500, past, future, 1),
+        (2, "Expired", 7500, (now - timedelta(hours=2)).isoformat(), past, 1),
+        (3, "No Flash Price", None, past, future, 1),
+        (4, "Inactive Product", 7500, past, future, 0),
+        (5, "Also Active", 5000, past, future, 1),
+    ])
+    db_conn.commit()
+
+    manager = FlashSaleManager(db_conn)
+    assert manager.get_active_flash_sales([1, 2, 3, 4, 5, 99]) == {1, 5}
+    assert manager.get_active_flash_sales([]) == set()
+    for pid in range(1, 6):
+        assert manager.is_flash_sale_active(pid) == (pid in {1, 5})
@@ -66,4 +66,83 @@ def test_rate_limiter_reset():
     limiter.reset("user1")
     
     # Should be allowed again
-    assert limiter.is_allowed("user1") == True
\ No newline at end of file
+    assert limiter.is_allowed("user1") == True
+
+def test_rate_limiter_concurrent_same_identifier():
+    """Test that concurrent checks never admit more than the limit"""
+    import threading
+    limiter = RateLimiter(max_requests=50, window_seconds=60)
+    results = []
+    
+    def hammer():
+        for _ in range(20):
+            results.append(limiter.is_allowed("shared"))
+    
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert results.count(True) == 50
+
+
+def test_rate_limiter_refills_gradually():
+    """Test that tokens come back at max_requests per window, not all at once"""
+    limiter = RateLimiter(max_requests=2, window_seconds=1)
+    
+    assert limiter.is_allowed("user1") == True
+    assert limiter.is_allowed("user1") == True
+    assert limiter.is_allowed("user1") == False
+    
+    # Half a window refills one token
+    time.sleep(0.6)
+    assert limiter.is_allowed("user1") == True
+    assert limiter.is_allowed("user1") == False
+
+
+def test_rate_limiter_forgets_idle_identifiers():
+    """Test that identifiers whose bucket has refilled are swept away"""
+    limiter = RateLimiter(max_requests=2, window_seconds=1)
+    limiter.shard_gc_interval = 1
+    
+    for i in range(20):
+        limiter.is_allowed(f"ip{i}")
+    assert sum(len(shard.data) for shard in limiter.shards) == 20
+    
+    time.sleep(0.6)
+    for shard in limiter.shards:
+        limiter._sweep(shard.data, time.monotonic_ns())
+    # One token spent, half a window passed: full again, nothing left to track
+    assert sum(len(shard.data) for shard in limiter.shards) == 0
+
+
+def test_rate_limit_decorator_rejects_with_retry_after():
+    """Rejections carry Retry-After for both JSON and browser clients"""
+    from flask import Flask
+    from src.flash_sales.rate_limiter import rate_limit
+
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    @app.route("/flash/products", endpoint="flash_sales.flash_products")
+    def products():
+        return "products"
+
+    @app.route("/limited")
+    @rate_limit(max_requests=2, window_seconds=3)
+    def limited():
+        return "ok"
+
+    client = app.test_client()
+    assert client.get("/limited").data == b"ok"
+    assert client.get("/limited").data == b"ok"
+
+    rv = client.get("/limited", headers={"Accept": "application/json"})
+    assert rv.status_code == 429
+    assert rv.headers["Retry-After"] == "2"
+    assert rv.get_json() == {"error": "Rate limit exceeded. Please try again later."}
+
+    rv = client.get("/limited", headers={"Accept": "text/html"})
+    assert rv.status_code == 302
+    assert rv.headers["Retry-After"] == "2"
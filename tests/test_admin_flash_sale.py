@@ -0,0 +1,64 @@
+import sqlite3
+
+from src.app import create_app
+
+
+def make_client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "flash.sqlite")
+    monkeypatch.setenv("APP_DB_PATH", db_path)
+    app = create_app()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO product(name, price_cents, stock) VALUES (?, ?, ?)",
+        [("A", 1000, 5), ("B", 2000, 5), ("C", 3000, 5)],
+    )
+    conn.commit()
+    conn.close()
+    return app.test_client(), db_path
+
+
+def flash_state(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT id, flash_sale_active, flash_sale_price_cents FROM product ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def test_flash_sale_set_and_remove_accept_several_products(tmp_path, monkeypatch):
+    client, db_path = make_client(tmp_path, monkeypatch)
+
+    rv = client.post("/admin/flash-sale/set", data={"product_id": ["1", "3"], "flash_price": ["5.00", "12.50"]})
+    assert rv.status_code == 302
+    assert flash_state(db_path) == [(1, 1, 500), (2, 0, None), (3, 1, 1250)]
+
+    client.post("/admin/flash-sale/remove", data={"product_id": ["1", "3"]})
+    assert flash_state(db_path) == [(1, 0, None), (2, 0, None), (3, 0, None)]
+
+
+def test_flash_sale_set_rejects_mismatched_lists(tmp_path, monkeypatch):
+    client, db_path = make_client(tmp_path, monkeypatch)
+    client.post("/admin/flash-sale/set", data={"product_id": ["1", "2"], "flash_price": ["5.00"]})
+    assert all(active == 0 for _, active, _ in flash_state(db_path))
+
+
+def test_flash_sale_list_reflects_changes(tmp_path, monkeypatch):
+    client, _ = make_client(tmp_path, monkeypatch)
+    assert b"$7.25" not in client.get("/admin/flash-sale").data
+    client.post("/admin/flash-sale/set", data={"product_id": "2", "flash_price": "7.25"})
+    # The cached list is dropped along with the product cache
+    assert b"$7.25" in client.get("/admin/flash-sale").data
+
+
+def test_flash_sale_list_reflects_partner_ingest(tmp_path, monkeypatch):
+    from src.partners.ingest_queue import enqueue_feed_db, process_next_job_once
+    from src.partners.testing import seed_partner_and_key
+
+    client, db_path = make_client(tmp_path, monkeypatch)
+    assert b"$44.00" not in client.get("/admin/flash-sale").data
+    partner_id = seed_partner_and_key(db_path, partner_name="p1", api_key="k1")
+    enqueue_feed_db(db_path, partner_id, [{"name": "B", "price_cents": 4400, "stock": 5}])
+    assert process_next_job_once(db_path)["status"] == "done"
+    assert b"$44.00" in client.get("/admin/flash-sale").data
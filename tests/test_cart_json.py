@@ -0,0 +1,39 @@
+import sqlite3
+
+from src.app import create_app
+
+
+XHR = {"X-Requested-With": "XMLHttpRequest"}
+
+
+def make_client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cart.sqlite")
+    monkeypatch.setenv("APP_DB_PATH", db_path)
+    app = create_app()
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO product(name, price_cents, stock) VALUES ('Widget', 100, 2)")
+    conn.commit()
+    conn.close()
+    return app.test_client()
+
+
+def test_cart_routes_answer_xhr_with_json(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+
+    rv = client.post("/cart/add", data={"product_id": 1, "qty": 1}, headers=XHR)
+    assert rv.status_code == 200
+    assert rv.get_json()["cart"] == {"1": 1}
+
+    rv = client.post("/cart/add", data={"product_id": 1, "qty": 5}, headers=XHR)
+    assert rv.status_code == 409
+    assert rv.get_json()["ok"] is False
+
+    rv = client.post("/cart/remove", data={"product_id": "1"}, headers={"Accept": "application/json"})
+    assert rv.get_json() == {"ok": True, "message": "Item removed from cart", "cart": {}}
+
+
+def test_cart_routes_still_redirect_for_forms(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    rv = client.post("/cart/add", data={"product_id": 99, "qty": 1})
+    assert rv.status_code == 302
+    assert rv.headers["Location"].endswith("/products")
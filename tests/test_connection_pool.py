@@ -0,0 +1,78 @@
+import sqlite3
+
+from src.dao import ConnectionPool, get_pool, fetch_dicts
+
+
+def test_pool_reuses_released_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"), max_idle=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_connection_context_returns_connection_to_pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "ctx.sqlite"), max_idle=2)
+    with pool.connection() as conn:
+        conn.execute("SELECT 1")
+    assert pool.acquire() is conn
+
+
+def test_pool_applies_pragmas_and_row_factory(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"))
+    conn = pool.acquire()
+    try:
+        assert conn.row_factory is sqlite3.Row
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    finally:
+        pool.release(conn)
+    pool.close_all()
+
+
+def test_pool_rolls_back_uncommitted_work_on_release(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"))
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (v INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    pool.release(conn)
+    conn = pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.release(conn)
+
+
+def test_pool_closes_overflow_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"), max_idle=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is first
+
+
+def test_get_pool_is_shared_per_path(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    assert get_pool(path) is get_pool(path)
+
+
+def test_fetch_dicts_returns_plain_dicts(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"))
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("INSERT INTO t (id, name) VALUES (1, 'a')")
+    rows = fetch_dicts(conn, "SELECT id, name AS label FROM t WHERE id >= ? ORDER BY id", (1,))
+    assert rows == [{"id": 1, "label": "a"}]
+    assert type(rows[0]) is dict
+    # The connection's own row factory is untouched
+    assert isinstance(conn.execute("SELECT 1 AS x").fetchone(), sqlite3.Row)
+    pool.release(conn)
+
+
+def test_pool_stats_track_borrowed_and_idle(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "stats.sqlite"), max_idle=1)
+    a, b = pool.acquire(), pool.acquire()
+    assert pool.stats() == {"active": 2, "idle": 0, "total": 2, "max_idle": 1}
+    pool.release(a)
+    pool.release(b)  # pool full: closed
+    assert pool.stats() == {"active": 0, "idle": 1, "total": 1, "max_idle": 1}
+    pool.close_all()
+    assert pool.stats()["total"] == 0
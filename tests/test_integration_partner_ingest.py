@@ -70,3 +70,25 @@ def test_async_ingest_enqueue_called(tmp_path, monkeypatch):
     assert called[0][0] == pid
     # product payload should be passed through (or similar dict); ensure name present
     assert any(p.get("name") == "AsyncTest" for p in called[0][1])
+
+
+def test_main_app_async_ingest_returns_job(tmp_path, monkeypatch):
+    db_path, pid = setup_db(tmp_path)
+    monkeypatch.setenv("APP_DB_PATH", db_path)
+
+    from src.app import create_app
+    app = create_app()
+
+    client = app.test_client()
+    payload = [{"sku": "sku-main-async", "name": "MainAsyncTest", "price": 2.0, "stock": 3}]
+    resp = client.post("/partner/ingest?async=1", data=json.dumps(payload), content_type="application/json", headers={"X-API-Key": "test-key"})
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert body["status"] == "queued"
+    assert body["status_url"] == f"/partners/jobs/{body['job_id']}"
+
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT partner_id, payload FROM partner_ingest_jobs WHERE id = ?", (body["job_id"],)).fetchone()
+    conn.close()
+    assert row[0] == pid
+    assert json.loads(row[1])[0]["name"] == "MainAsyncTest"
@@ -48,3 +48,19 @@ def test_app_config_low_stock_threshold_env(monkeypatch):
     monkeypatch.setenv('LOW_STOCK_THRESHOLD', '12')
     app = create_app()
     assert app.config['LOW_STOCK_THRESHOLD'] == 12
+
+def test_low_stock_list_is_cached_until_cleared():
+    from src.flash_sales.cache import SimpleCache
+
+    conn = get_conn()
+    seed_products(conn)
+    cache = SimpleCache(default_ttl=60)
+    repo = AProductRepo(conn, cache=cache)
+    assert [p['name'] for p in repo.get_low_stock_products(5)] == ['CCC', 'BBB']
+
+    conn.execute("UPDATE product SET stock = 1 WHERE name = 'AAA'")
+    assert [p['name'] for p in repo.get_low_stock_products(5)] == ['CCC', 'BBB']
+
+    cache.clear()
+    assert [p['name'] for p in repo.get_low_stock_products(5)] == ['AAA', 'CCC', 'BBB']
+    conn.close()
@@ -0,0 +1,166 @@
+import threading
+import time
+
+from src.observability.metrics_collector import MetricsCollector, MetricsBuffer
+
+
+def test_buffer_applies_samples_on_flush():
+    collector = MetricsCollector()
+    buf = MetricsBuffer(collector)
+
+    buf.increment_counter('errors_total')
+    buf.increment_counter('errors_total', 2)
+    buf.increment_counter('http_errors', labels={'type': '4xx'})
+    buf.observe('http_request_duration_seconds', 0.25, labels={'endpoint': 'x', 'method': 'GET', 'status': 200})
+    buf.record_event('errors_total')
+
+    # Nothing reaches the collector until the buffer is drained
+    assert collector.get_counter('errors_total') == 0
+
+    buf.flush()
+    assert collector.get_counter('errors_total') == 3
+    assert collector.get_counter('http_errors', {'type': '4xx'}) == 1
+    assert collector.get_histogram_stats('http_request_duration_seconds')['count'] == 1
+    assert collector.get_rate('errors_total', window_seconds=60) > 0
+    assert len(buf.pending) == 0
+
+
+def test_buffer_drops_oldest_samples_when_full():
+    collector = MetricsCollector()
+    buf = MetricsBuffer(collector, maxlen=3)
+    for i in range(5):
+        buf.observe('latency', float(i))
+    buf.flush()
+    stats = collector.get_histogram_stats('latency')
+    assert stats['count'] == 3
+    assert stats['min'] == 2.0
+
+
+def test_buffer_merges_per_thread_counters_incrementally():
+    collector = MetricsCollector()
+    buf = MetricsBuffer(collector)
+
+    def work():
+        for _ in range(1000):
+            buf.increment_counter('hits')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    buf.increment_counter('hits')
+    buf.flush()
+    for t in threads:
+        t.join()
+    buf.flush()
+    assert collector.get_counter('hits') == 4001
+    # Finished writer threads are dropped once fully flushed
+    assert len(buf._thread_counts) == 1
+
+    buf.increment_counter('hits', 5)
+    buf.flush()
+    buf.flush()
+    assert collector.get_counter('hits') == 4006
+
+
+def test_increment_many_counts_each_entry():
+    collector = MetricsCollector()
+    collector.increment_many([
+        ('circuit_breaker_failures', {'circuit': 'pay'}),
+        ('circuit_breaker_opens', {'circuit': 'pay'}),
+        ('circuit_breaker_failures', {'circuit': 'pay'}),
+        ('plain', None),
+    ])
+    assert collector.get_counter('circuit_breaker_failures', {'circuit': 'pay'}) == 2
+    assert collector.get_counter('circuit_breaker_opens', {'circuit': 'pay'}) == 1
+    assert collector.get_counter('plain') == 1
+
+
+def test_snapshot_matches_individual_reads():
+    collector = MetricsCollector()
+    collector.increment_counter('orders_total', labels={'status': 'success'})
+    collector.set_gauge('avg_refund_amount_cents', 1250)
+    for _ in range(3):
+        collector.record_event('orders_total')
+    collector.observe('http_request_duration_seconds', 0.2, {'endpoint': 'x'})
+
+    snap = collector.snapshot()
+    assert snap['counters'] == {'orders_total{status=success}': 1}
+    assert snap['gauges'] == {'avg_refund_amount_cents': 1250}
+    assert snap['rates']['orders_total'][60] == collector.get_rate('orders_total', 60)
+    assert snap['rates']['refunds_total'][86400] == 0.0
+    assert snap['histograms']['http_request_duration_seconds'] == collector.get_histogram_stats('http_request_duration_seconds')
+
+
+def test_histogram_percentiles_use_lower_quantiles(monkeypatch):
+    import random
+    from src.observability import metrics_collector as mc
+
+    values = [random.random() for _ in range(997)]
+    ranked = sorted(values)
+    expected = {
+        'count': 997, 'min': ranked[0], 'max': ranked[-1],
+        'p50': ranked[498], 'p95': ranked[946], 'p99': ranked[986],
+    }
+    collector = MetricsCollector()
+    for v in values:
+        collector.observe('latency', v, {'endpoint': 'x'})
+
+    backends = [None] + ([mc.np] if mc.np is not None else [])
+    for backend in backends:
+        monkeypatch.setattr(mc, 'np', backend)
+        stats = collector.get_histogram_stats('latency')
+        assert {k: stats[k] for k in expected} == expected
+        assert abs(stats['sum'] - sum(values)) < 1e-9
+
+
+def test_rate_counts_only_events_inside_window():
+    collector = MetricsCollector()
+    now = time.monotonic_ns()
+    collector.apply_batch({}, [], [('orders_total', now - age * 10**9) for age in (7200, 3000, 90, 30, 5, 1)])
+    assert collector.get_rate('orders_total', window_seconds=60) == 3 / 60
+    assert collector.get_rate('orders_total', window_seconds=3600) == 5 / 3600
+    assert collector.get_rate('orders_total', window_seconds=86400) == 6 / 86400
+    assert collector.get_rate('missing', window_seconds=60) == 0.0
+
+
+def test_rate_buckets_events_per_second():
+    collector = MetricsCollector()
+    now = time.monotonic_ns()
+    collector.apply_batch({}, [], [('hits', now - 2 * 10**9)] * 12000 + [('hits', now)] * 3)
+    # Events share buckets, so volume is not capped by a sample limit
+    assert len(collector.time_windowed['hits']) == 2
+    assert collector.get_rate('hits', window_seconds=60) == 12003 / 60
+
+
+def test_metric_keys_are_memoized_and_bounded(monkeypatch):
+    from src.observability import metrics_collector as mc
+
+    monkeypatch.setattr(mc, 'KEY_CACHE_SIZE', 3)
+    collector = MetricsCollector()
+    key = collector._make_key('orders_total', {'status': 'success', 'a': 1})
+    assert key == 'orders_total{a=1,status=success}'
+    assert collector._make_key('orders_total', {'status': 'success', 'a': 1}) is key
+    assert collector._make_key('orders_total', {'a': 1, 'status': 'success'}) == key
+    assert collector._make_key('plain') == 'plain'
+
+    for i in range(10):
+        collector._make_key('hits', {'id': i})
+    assert len(collector._key_cache) <= 3
+
+
+def test_business_metrics_read_labelled_counters(tmp_path, monkeypatch):
+    monkeypatch.setenv('APP_DB_PATH', str(tmp_path / 'missing.sqlite'))
+    collector = MetricsCollector()
+    collector.increment_counter('orders_total', 3)
+    collector.increment_counter('orders_total', 2, {'status': 'success'})
+    collector.increment_counter('refunds_total', labels={'status': 'pending'})
+    collector.increment_counter('http_errors', 4, {'type': '5xx'})
+    collector.observe('http_request_duration_seconds', 0.5, {'endpoint': 'x'})
+
+    metrics = collector.get_business_metrics()
+    assert metrics['orders']['total'] == 3
+    assert metrics['orders']['successful'] == 2
+    assert metrics['orders']['failed'] == 0
+    assert metrics['refunds']['pending'] == 1
+    assert metrics['errors']['by_type'] == {'4xx': 0, '5xx': 4}
+    assert metrics['performance']['avg_response_time_ms'] == 500
@@ -35,3 +35,40 @@ def test_migration_adds_strict_column(tmp_path: Path):
     cols = [r[1] for r in cur.fetchall()]
     conn.close()
     assert "strict" in cols
+
+
+def test_init_db_adds_and_backfills_replacement_sale_id(tmp_path: Path):
+    from src.main import init_db
+
+    db_file = str(tmp_path / "app.sqlite")
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "CREATE TABLE rma_activity_log (id INTEGER PRIMARY KEY, rma_id INTEGER, action TEXT, notes TEXT)"
+    )
+    conn.execute(
+        "INSERT INTO rma_activity_log (rma_id, action, notes) VALUES "
+        "(1, 'REPLACEMENT_PROCESSED', 'Replacement order created: #42. Inventory decreased for replacement items.'), "
+        "(1, 'STATUS_CHANGE', 'Approved')"
+    )
+    conn.commit()
+    conn.close()
+
+    init_db(db_file)
+    init_db(db_file)  # idempotent
+
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute("SELECT action, replacement_sale_id FROM rma_activity_log ORDER BY id").fetchall()
+    indexes = [r[1] for r in conn.execute("PRAGMA index_list(rma_activity_log)")]
+    conn.close()
+    assert rows == [("REPLACEMENT_PROCESSED", 42), ("STATUS_CHANGE", None)]
+    assert "idx_rma_activity_replacement_sale_id" in indexes
+
+
+def test_init_db_switches_database_to_wal(tmp_path: Path):
+    from src.main import init_db
+
+    db_file = init_db(str(tmp_path / "app.sqlite"))
+    conn = sqlite3.connect(db_file)
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+    assert mode == "wal"
@@ -0,0 +1,23 @@
+from flask import Flask
+
+from src import monitoring_routes
+from src.monitoring_routes import monitoring_bp
+
+
+def make_client():
+    app = Flask(__name__)
+    app.register_blueprint(monitoring_bp)
+    return app.test_client()
+
+
+def test_health_response_is_reused_within_ttl(monkeypatch):
+    client = make_client()
+    now = [monitoring_routes.time.monotonic() + 3600]
+    monkeypatch.setattr(monitoring_routes.time, "monotonic", lambda: now[0])
+
+    first = client.get("/monitoring/api/health")
+    assert first.headers["Cache-Control"] == "max-age=1"
+    assert client.get("/monitoring/api/health").json == first.json
+
+    now[0] += monitoring_routes.RESPONSE_CACHE_TTL
+    assert client.get("/monitoring/api/health").json["timestamp"] != first.json["timestamp"]
@@ -0,0 +1,87 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src import notifications
+from src.notifications import NotificationService
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+MIGRATION = MIGRATIONS / "0004_add_notifications.sql"
+INDEX_MIGRATION = MIGRATIONS / "0005_add_notification_read_indexes.sql"
+
+
+@pytest.fixture
+def conn():
+    notifications.unread_count_cache.clear()
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(MIGRATION.read_text())
+    conn.executescript(INDEX_MIGRATION.read_text())
+    yield conn
+    conn.close()
+    notifications.unread_count_cache.clear()
+
+
+def notify(conn, user_id=1):
+    return NotificationService.create_rma_status_notification(
+        conn, user_id, None, "RMA-1", None, "SUBMITTED"
+    )
+
+
+def test_unread_count_is_cached(conn):
+    notify(conn)
+    assert NotificationService.get_unread_count(conn, 1) == 1
+    # A write that bypasses the service is only seen once the entry expires
+    conn.execute("UPDATE notifications SET is_read = 1")
+    assert NotificationService.get_unread_count(conn, 1) == 1
+
+
+def test_unread_count_follows_service_writes(conn):
+    first = notify(conn)
+    notify(conn)
+    assert NotificationService.get_unread_count(conn, 1) == 2
+
+    notify(conn)
+    assert NotificationService.get_unread_count(conn, 1) == 3
+
+    assert NotificationService.mark_as_read(conn, first, 1)
+    assert NotificationService.get_unread_count(conn, 1) == 2
+
+    assert NotificationService.mark_all_as_read(conn, 1) == 2
+    assert NotificationService.get_unread_count(conn, 1) == 0
+    # Other users are unaffected
+    assert NotificationService.get_unread_count(conn, 2) == 0
+
+
+def test_bulk_creation_matches_single_creation(conn):
+    NotificationService.get_unread_count(conn, 1)
+    created = NotificationService.create_rma_status_notifications_bulk(conn, [
+        (1, None, "RMA-1", "SUBMITTED", None),
+        (1, None, "RMA-2", "COMPLETED", "REFUND"),
+        (2, None, "RMA-3", "SHIPPING", None),
+    ])
+    assert created == 3
+    assert NotificationService.get_unread_count(conn, 1) == 2
+    assert NotificationService.get_unread_count(conn, 2) == 1
+
+    titles = [row[0] for row in conn.execute("SELECT title FROM notifications ORDER BY id")]
+    assert titles == ["Return Request Submitted", "Refund Completed", "Return Status Update"]
+    assert NotificationService.create_rma_status_notifications_bulk(conn, []) == 0
+
+
+def test_notification_list_needs_no_sort(conn):
+    plan = " ".join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM notifications WHERE user_id = ? ORDER BY created_at DESC LIMIT 50", (1,)
+    ))
+    assert "ix_notif_user_created" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_user_notifications_are_plain_dicts(conn):
+    first = notify(conn)
+    notify(conn, user_id=2)
+    NotificationService.mark_as_read(conn, first, 1)
+    (item,) = NotificationService.get_user_notifications(conn, 1)
+    assert list(item) == ["id", "type", "title", "message", "rma_id", "rma_number", "is_read", "read_at", "created_at"]
+    assert item["id"] == first and item["is_read"] is True
+    assert NotificationService.get_user_notifications(conn, 1, unread_only=True) == []
@@ -17,3 +17,29 @@ def test_parse_csv_feed():
     assert out[0]["sku"] == "s2"
     assert out[0]["name"] == "Item B"
     assert out[0]["price_cents"] == 250
+
+
+def test_iter_csv_batches_streams_in_chunks():
+    import io
+    from src.adapters import iter_csv_batches
+
+    rows = "".join(f"sku{i},Item {i},1.5,{i}\n" for i in range(5))
+    stream = io.BytesIO(("sku,name,price,stock\n" + rows).encode())
+    batches = list(iter_csv_batches(stream, batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[2][0]["name"] == "Item 4"
+    assert batches[0][1]["price_cents"] == 150
+    assert not stream.closed
+
+
+def test_iter_json_batches_streams_in_chunks():
+    pytest.importorskip("ijson")
+    import io
+    import json
+    from src.adapters import iter_json_batches, parse_json
+
+    items = [{"sku": f"sku{i}", "name": f"Item {i}", "price": 1.15, "stock": i} for i in range(5)]
+    payload = json.dumps(items).encode()
+    batches = list(iter_json_batches(io.BytesIO(payload), batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert [p for b in batches for p in b] == parse_json(payload, "application/json")
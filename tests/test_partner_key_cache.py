@@ -0,0 +1,41 @@
+import json
+import sqlite3
+
+from src.app import create_app
+
+
+def make_client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "keys.sqlite")
+    monkeypatch.setenv("APP_DB_PATH", db_path)
+    app = create_app()
+    conn = sqlite3.connect(db_path)
+    pid = conn.execute("INSERT INTO partner (name, format) VALUES ('P', 'json')").lastrowid
+    conn.execute("INSERT INTO partner_api_keys (partner_id, api_key) VALUES (?, 'k1')", (pid,))
+    conn.commit()
+    conn.close()
+    return app.test_client(), db_path
+
+
+def ingest(client, key):
+    payload = json.dumps([{"sku": "s1", "name": "Cached", "price": 1.0, "stock": 1}])
+    return client.post("/partner/ingest?async=0", data=payload,
+                       content_type="application/json", headers={"X-API-Key": key})
+
+
+def test_revoked_key_stays_valid_until_flush(tmp_path, monkeypatch):
+    client, db_path = make_client(tmp_path, monkeypatch)
+    assert ingest(client, "k1").status_code == 200
+    assert ingest(client, "nope").status_code == 401
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM partner_api_keys WHERE api_key = 'k1'")
+    conn.commit()
+    conn.close()
+    # Served from the key cache without touching the table
+    assert ingest(client, "k1").status_code == 200
+
+    assert client.post("/admin/cache/partner-keys/flush").status_code == 403
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    assert client.post("/admin/cache/partner-keys/flush").get_json() == {"flushed": True}
+    assert ingest(client, "k1").status_code == 401
@@ -0,0 +1,49 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from src import passwords
+from src.passwords import hash_password, verify_password, needs_rehash
+
+
+def test_hash_roundtrip():
+    stored = hash_password("s3cret")
+    assert verify_password(stored, "s3cret")
+    assert not verify_password(stored, "wrong")
+    assert not needs_rehash(stored)
+
+
+def test_legacy_pbkdf2_hash_still_verifies():
+    legacy = generate_password_hash("s3cret", method="pbkdf2:sha256")
+    assert verify_password(legacy, "s3cret")
+    # Only upgraded when argon2 is available to upgrade to
+    assert needs_rehash(legacy) == (passwords._argon2 is not None)
+
+
+def test_pbkdf2_iterations_override(monkeypatch):
+    monkeypatch.setattr(passwords, "_argon2", None)
+    monkeypatch.setattr(passwords, "PBKDF2_ITERATIONS", 1000)
+    stored = hash_password("s3cret")
+    assert stored.startswith("pbkdf2:sha256:1000$")
+    assert verify_password(stored, "s3cret")
+
+
+def test_argon2_hash_without_library_is_unsupported(monkeypatch):
+    monkeypatch.setattr(passwords, "_argon2", None)
+    with pytest.raises(ValueError):
+        verify_password("$argon2id$v=19$m=65536,t=2,p=2$abc$def", "s3cret")
+
+
+def test_unknown_user_delay_measures_once(monkeypatch):
+    monkeypatch.setattr(passwords, "_verify_seconds", None)
+    slept = []
+    monkeypatch.setattr(passwords, "sleep", slept.append)
+    passwords.unknown_user_delay()
+    measured = passwords._verify_seconds
+    assert measured > 0
+
+    def fail(*args):
+        raise AssertionError("hash verified again")
+
+    monkeypatch.setattr(passwords, "verify_password", fail)
+    passwords.unknown_user_delay()
+    assert slept == [measured, measured]
@@ -84,4 +84,66 @@ def test_product_active_filtering():
     total_count = cursor.fetchone()[0]
     assert total_count == 2
     
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def test_get_products_bulk_returns_active_products_by_id():
+    """Bulk lookup applies flash prices and skips inactive/unknown IDs"""
+    from src.product_repo import AProductRepo
+
+    conn = get_test_connection()
+    create_test_schema(conn)
+    conn.execute("ALTER TABLE product ADD COLUMN flash_sale_active INTEGER DEFAULT 0")
+    conn.execute("ALTER TABLE product ADD COLUMN flash_sale_price_cents INTEGER")
+    conn.execute("UPDATE product SET flash_sale_active = 1, flash_sale_price_cents = 1500 WHERE id = 1")
+
+    products = AProductRepo(conn).get_products_bulk([1, 2, 99, 1])
+    assert list(products) == [1]
+    assert products[1]['price_cents'] == 1500
+    assert products[1]['original_price'] == 1999
+    assert products[1]['is_flash_sale'] is True
+    assert AProductRepo(conn).get_products_bulk([]) == {}
+
+    conn.close()
+
+def test_product_cache_serves_repeat_reads():
+    """A cached repo answers repeat lookups without hitting the database"""
+    from src.product_repo import AProductRepo
+    from src.flash_sales.cache import SimpleCache
+
+    conn = get_test_connection()
+    create_test_schema(conn)
+    conn.execute("ALTER TABLE product ADD COLUMN flash_sale_active INTEGER DEFAULT 0")
+    conn.execute("ALTER TABLE product ADD COLUMN flash_sale_price_cents INTEGER")
+
+    cache = SimpleCache(default_ttl=60)
+    repo = AProductRepo(conn, cache=cache)
+    assert repo.get_product(1)['price_cents'] == 1999
+
+    conn.execute("UPDATE product SET price_cents = 2500 WHERE id = 1")
+    assert repo.get_product(1)['price_cents'] == 1999
+    assert repo.get_products_bulk([1])[1]['price_cents'] == 1999
+
+    cache.clear()
+    assert repo.get_product(1)['price_cents'] == 2500
+
+    conn.close()
+
+def test_cached_product_list_is_not_shared_with_callers():
+    """Mutating a returned catalog list must not leak into the cache"""
+    from src.product_repo import AProductRepo
+    from src.flash_sales.cache import SimpleCache
+
+    conn = get_test_connection()
+    create_test_schema(conn)
+    conn.execute("ALTER TABLE product ADD COLUMN flash_sale_active INTEGER DEFAULT 0")
+    conn.execute("ALTER TABLE product ADD COLUMN flash_sale_price_cents INTEGER")
+
+    repo = AProductRepo(conn, cache=SimpleCache(default_ttl=60))
+    first = repo.get_all_products()
+    first[0]['price_cents'] = 1
+    second = repo.get_all_products()
+    second[0]['price_cents'] = 2
+
+    assert repo.get_all_products()[0]['price_cents'] not in (1, 2)
+
+    conn.close()
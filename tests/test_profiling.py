@@ -0,0 +1,16 @@
+import pytest
+
+from src.observability.profiling import RequestProfiler
+
+
+def test_disabled_without_sample_rate(tmp_path):
+    assert not RequestProfiler(0, str(tmp_path)).enabled
+    assert RequestProfiler(0, str(tmp_path)).start("abc") is None
+
+
+def test_reports_rotate_through_ring_slots(tmp_path):
+    pytest.importorskip("pyinstrument")
+    rp = RequestProfiler(1, str(tmp_path), keep=2)
+    paths = [rp.finish(rp.start(rid)) for rid in ("a", "b", "c")]
+    assert paths[0] == paths[2] != paths[1]
+    assert sorted(f.name for f in tmp_path.iterdir()) == ["profile-00.html", "profile-01.html"]
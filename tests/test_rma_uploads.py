@@ -0,0 +1,29 @@
+from src.app import create_app
+
+
+def make_client(tmp_path, monkeypatch, accel_prefix):
+    monkeypatch.setenv("APP_DB_PATH", str(tmp_path / "uploads.sqlite"))
+    app = create_app()
+    app.config["RMA_UPLOAD_ACCEL_PREFIX"] = accel_prefix
+    return app.test_client()
+
+
+def test_rma_upload_is_handed_to_proxy(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch, "/internal_rma/")
+    rv = client.get("/uploads/rma/photo.jpg")
+    assert rv.status_code == 200
+    assert rv.headers["X-Accel-Redirect"] == "/internal_rma/photo.jpg"
+    assert rv.mimetype == "image/jpeg"
+    assert rv.data == b""
+
+
+def test_rma_upload_rejects_unsafe_names(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch, "/internal_rma/")
+    assert client.get("/uploads/rma/..").status_code == 404
+
+
+def test_rma_upload_without_proxy_is_served_by_flask(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch, "")
+    rv = client.get("/uploads/rma/missing.jpg")
+    assert rv.status_code == 404
+    assert "X-Accel-Redirect" not in rv.headers
@@ -0,0 +1,46 @@
+import sqlite3
+from pathlib import Path
+
+from flask import Flask, session
+
+from src.session_interface import DatabaseSessionInterface
+
+
+def make_app(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(Path("db/init.sql").read_text())
+    conn.close()
+
+    app = Flask(__name__)
+    app.session_interface = DatabaseSessionInterface(db_path)
+
+    @app.post("/set/<value>")
+    def set_value(value):
+        session["value"] = value
+        return "ok"
+
+    return app, db_path
+
+
+def test_unchanged_session_is_not_rewritten(tmp_path):
+    app, db_path = make_app(tmp_path)
+    client = app.test_client()
+
+    first = client.post("/set/a")
+    assert "Set-Cookie" in first.headers
+    # A reloaded session is marked permanent, which changes its contents once
+    client.post("/set/a")
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE flask_sessions SET updated_at = 'marker'")
+    conn.commit()
+
+    # Same value again: modified flag is set but contents are identical
+    again = client.post("/set/a")
+    assert "Set-Cookie" not in again.headers
+    assert conn.execute("SELECT updated_at FROM flask_sessions").fetchone()[0] == "marker"
+
+    client.post("/set/b")
+    assert conn.execute("SELECT updated_at FROM flask_sessions").fetchone()[0] != "marker"
+    conn.close()
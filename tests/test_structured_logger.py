@@ -0,0 +1,99 @@
+import json
+import logging
+
+from flask import Flask, g
+
+from src.observability.structured_logger import RECENT_LOG_SIZE, JsonFormatter, StructuredLogger, get_request_id
+
+app = Flask(__name__)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_logger(name, level):
+    logger = StructuredLogger(name, log_level=level)
+    handler = ListHandler()
+    logger.logger.handlers = [handler]
+    return logger, handler
+
+
+def test_percent_args_are_formatted_when_enabled():
+    logger, handler = make_logger("test_structured_enabled", "INFO")
+    with app.test_request_context("/x"):
+        logger.info("Request started: %s %s", "GET", "/x", path="/x")
+    entry = json.loads(handler.messages[0])
+    assert entry["message"] == "Request started: GET /x"
+    assert entry["context"] == {"path": "/x"}
+
+
+def test_filtered_level_skips_entry_building(monkeypatch):
+    logger, handler = make_logger("test_structured_filtered", "WARNING")
+    assert not logger.isEnabledFor(logging.INFO)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("entry built for a filtered record")
+
+    monkeypatch.setattr(logger, "_build_log_entry", fail)
+    logger.info("ignored %s", "arg")
+    assert handler.messages == []
+
+
+
+class FormattedListHandler(ListHandler):
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+def test_async_mode_serializes_on_listener_thread():
+    logger = StructuredLogger("test_structured_async", log_level="INFO")
+    handler = FormattedListHandler()
+    handler.setFormatter(JsonFormatter())
+    logger.logger.handlers = [handler]
+    logger.start_async()
+    try:
+        assert logger.logger.handlers != [handler]
+        with app.test_request_context("/y"):
+            logger.info("queued %s", "entry", k=1)
+    finally:
+        logger.stop_async()
+    assert logger.logger.handlers == [handler]
+    entry = json.loads(handler.messages[0])
+    assert entry["message"] == "queued entry"
+    assert entry["context"] == {"k": 1}
+
+
+def test_request_id_is_created_on_first_use():
+    with app.test_request_context("/z"):
+        assert "request_id" not in g
+        first = get_request_id()
+        assert len(first) == 32
+        assert get_request_id() == first
+    with app.test_request_context("/z", headers={"X-Request-Id": "upstream-1"}):
+        assert get_request_id() == "upstream-1"
+
+
+def test_recent_ring_keeps_latest_entries():
+    logger, handler = make_logger("test_structured_ring", "INFO")
+    for i in range(RECENT_LOG_SIZE + 5):
+        logger.info("entry %d", i)
+    logger.debug("filtered")
+    assert len(logger.recent_ring) == RECENT_LOG_SIZE
+    assert logger.recent_ring[0]["message"] == "entry 5"
+    assert json.loads(handler.messages[-1]) == logger.recent_ring[-1]
+
+
+def test_entries_encode_with_and_without_orjson(monkeypatch):
+    from src.observability import structured_logger as sl
+
+    entry = {"message": "m", "context": {"ids": [1, 2], "nested": {"k": "é"}}}
+    backends = [None] + ([sl.orjson] if sl.orjson is not None else [])
+    for backend in backends:
+        monkeypatch.setattr(sl, "orjson", backend)
+        assert json.loads(sl.dumps_entry(entry)) == entry
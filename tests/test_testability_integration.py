@@ -32,3 +32,23 @@ def test_enqueue_and_process_job_once(tmp_path):
     assert row[0] == "Test Item"
     assert row[1] == 1000
     assert row[2] == 2
+
+
+def test_processed_job_clears_product_cache(tmp_path):
+    from src.flash_sales.cache import SimpleCache
+    from src.product_repo import register_product_cache
+
+    db_file = str(tmp_path / "test_app.sqlite")
+    create_test_db(db_file)
+    partner_id = seed_partner_and_key(db_file, partner_name="t2", api_key="k2")
+
+    cache = SimpleCache(default_ttl=60)
+    register_product_cache(cache)
+    cache.set("products:all", [])
+
+    products = [{"sku": "sku-test-2", "name": "Cached Item", "price_cents": 500, "stock": 3}]
+    enqueue_feed_db(db_file, partner_id, products, feed_hash="h2")
+    res = process_next_job_once(db_file)
+
+    assert res.get("status") == "done"
+    assert cache.get("products:all") is None
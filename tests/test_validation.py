@@ -21,3 +21,42 @@ def test_validate_products_rejects_negative_price_stock():
     assert len(valid) == 0
     assert any("price_cents must be >= 0" in e for e in errors)
     assert any("stock must be >= 0" in e for e in errors)
+
+
+def test_upsert_products_batches_updates_and_inserts():
+    import sqlite3
+    from pathlib import Path
+    from src.partners.partner_ingest_service import upsert_products
+
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(Path("db/init.sql").read_text())
+    conn.execute("INSERT INTO product (name, price_cents, stock, active) VALUES ('Widget', 100, 1, 0)")
+    conn.commit()
+
+    items = [
+        {"sku": "", "name": " widget ", "price_cents": 150, "stock": 4},
+        {"sku": "", "name": "Gadget", "price_cents": 200, "stock": 2},
+        {"sku": "", "name": "gadget", "price_cents": 250, "stock": 3},
+    ]
+    upserted, errors = upsert_products(conn, items)
+    assert (upserted, errors) == (3, [])
+    rows = conn.execute("SELECT name, price_cents, stock, active FROM product ORDER BY id").fetchall()
+    assert rows == [("Widget", 150, 4, 1), ("Gadget", 250, 3, 1)]
+    assert not conn.in_transaction
+    conn.close()
+
+
+def test_upsert_products_matches_non_ascii_names_on_reingest():
+    import sqlite3
+    from pathlib import Path
+    from src.partners.partner_ingest_service import upsert_products
+
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(Path("db/init.sql").read_text())
+
+    assert upsert_products(conn, [{"name": "Éclair Box", "price_cents": 500, "stock": 2}]) == (1, [])
+    assert upsert_products(conn, [{"name": " ÉCLAIR box ", "price_cents": 450, "stock": 7}]) == (1, [])
+    # SQLite lower() leaves É alone, so only the ASCII letters fold
+    rows = conn.execute("SELECT name, price_cents, stock FROM product").fetchall()
+    assert rows == [("Éclair Box", 450, 7)]
+    conn.close()